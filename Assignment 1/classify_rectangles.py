@@ -1,131 +1,301 @@
+import os
 import re
+import sys
 import numpy as np
 import time
-import psutil
-import tracemalloc
+import heapq
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-from typing import List, Tuple
-
-# Measure current memory usage in MB
-def measure_memory_usage():
-    process = psutil.Process()
-    memory_info = process.memory_info()
-    return memory_info.rss / 1024 / 1024
-
-# Decorator to measure execution time and memory usage of functions
-def measure_performance(func):
-    def wrapper(*args, **kwargs):
-        tracemalloc.start()
-        start_memory = measure_memory_usage()
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        execution_time = end_time - start_time
-        end_memory = measure_memory_usage()
-        memory_used = end_memory - start_memory
-        current, peak = tracemalloc.get_traced_memory()
-        tracemalloc.stop()
-        print(f"\nPerformance metrics for {func.__name__}:")
-        print(f"Execution time: {execution_time:.4f} seconds")
-        print(f"Memory usage: {memory_used:.2f} MB")
-        print(f"Peak memory: {peak / 1024 / 1024:.2f} MB")
-        return result
-    return wrapper
-
-# Read rectangle data from a file
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from typing import Iterator, List, Tuple, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.binary_cache import load_cached_array, store_cached_array
+from common.instrumentation import measure_memory_usage, measure_performance, count
+from rectangle_results import (ABUTMENT_DIRECTIONS, OverlapPairs, ContainmentPairs, AbutmentPairs,
+                               format_result, result_ids)
+
+# Edges closer than this are treated as touching when checking abutment
+ABUTMENT_TOLERANCE = 1e-10
+
+# Box columns counted from the end, so the kernels and predicates take both the (n, 5) float rows
+# [id, x1, y1, x2, y2] of read_rectangle_data and the (n, 4) integer boxes of an IntegerLayout
+X1, Y1, X2, Y2 = -4, -3, -2, -1
+
+# Database units per layout unit in integer mode (e.g. 1000 for a nanometre grid under micron coordinates)
+DEFAULT_DBU = 1
+
+# Integer coordinates are stored as int32 when they stay within this bound, so that the difference of any
+# two coordinates still fits in int32; larger layouts use int64
+INT32_COORDINATE_LIMIT = 1 << 30
+
+# Largest distance from the grid, in database units, of a coordinate that is snapped to it
+GRID_SNAP_TOLERANCE = 1e-6
+
+# Rectangles per side of a tile in the vectorized pairwise kernels (bounds peak memory)
+DEFAULT_TILE_SIZE = 4096
+
+# One {id, x1, y1, x2, y2} record; \s* also spans line breaks inside a record
+RECT_PATTERN = re.compile(r'\{(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?)\}')
+
+# Characters read from the file per chunk by the streaming parser
+READ_CHUNK_SIZE = 1 << 20
+
+# Stream rectangle records from a file in fixed-size chunks, yielding (k, 5) float64 batches
+def iter_rectangle_batches(filename: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    carry = ''
+    with open(filename, 'r') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            buffer = carry + chunk
+            last_end = 0
+            values = []
+            for match in RECT_PATTERN.finditer(buffer):
+                values.extend(match.groups())
+                last_end = match.end()
+            if values:
+                yield np.array(values, dtype=np.float64).reshape(-1, 5)
+            if not chunk:
+                break
+            # Keep only a record that may continue in the next chunk
+            record_start = buffer.rfind('{', last_end)
+            carry = buffer[record_start:] if record_start >= 0 else ''
+
+# Read rectangle data from a file, reusing a memory-mapped binary sidecar when it is up to date
 @measure_performance
-def read_rectangle_data(filename: str) -> np.ndarray:
+def read_rectangle_data(filename: str, chunk_size: int = READ_CHUNK_SIZE, use_cache: bool = True) -> np.ndarray:
     try:
-        with open(filename, 'r') as file:
-            content = file.read().strip()
-        content = re.sub(r'\s+', ' ', content)
-        rect_pattern = re.compile(r'\{(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?),\s*(\d+(?:\.\d+)?)\}')
-        rectangles_match = rect_pattern.findall(content)
-        if not rectangles_match:
+        if use_cache:
+            cached = load_cached_array(filename, "rects")
+            if cached is not None:
+                print(f"Successfully loaded {len(cached)} rectangles from the binary cache.")
+                return cached
+        rectangles = np.empty((1024, 5), dtype=np.float64)
+        rows_read = 0
+        for batch in iter_rectangle_batches(filename, chunk_size):
+            if rows_read + len(batch) > len(rectangles):
+                grown = np.empty((max(2 * len(rectangles), rows_read + len(batch)), 5), dtype=np.float64)
+                grown[:rows_read] = rectangles[:rows_read]
+                rectangles = grown
+            rectangles[rows_read:rows_read + len(batch)] = batch
+            rows_read += len(batch)
+        if rows_read == 0:
             raise ValueError("No valid rectangle data found in the file")
-        rectangles = np.array([list(map(float, rect)) for rect in rectangles_match])
+        rectangles = rectangles[:rows_read].copy() if rows_read < len(rectangles) else rectangles
         print(f"Successfully read {len(rectangles)} rectangles from the file.")
+        if use_cache:
+            store_cached_array(filename, "rects", rectangles)
         return rectangles
     except Exception as e:
         print(f"Error reading file: {e}")
         return None
 
-# Plot all rectangles on a graph
-def plot_rectangles(rectangles: np.ndarray, point: Tuple[float, float] = None, title: str = "Rectangles"):
-    plt.figure(figsize=(12, 10))
-    plt.title(title)
+# Rectangles on an integer database-unit grid; the IDs are kept apart from the (n, 4) [x1, y1, x2, y2] boxes,
+# which lets the boxes be int32 and makes every edge comparison exact
+class IntegerLayout:
+    def __init__(self, ids: np.ndarray, boxes: np.ndarray, dbu: float = DEFAULT_DBU):
+        self.ids = ids
+        self.boxes = boxes
+        self.dbu = dbu
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.boxes.nbytes
+
+    # The (n, 5) float64 array read_rectangle_data returns, in layout units (e.g. for plotting)
+    def to_float(self) -> np.ndarray:
+        return np.column_stack((self.ids.astype(np.float64), self.boxes / self.dbu))
+
+Layout = Union[np.ndarray, IntegerLayout]
+
+# Box array of a layout: the float rows themselves, or the integer boxes
+def layout_boxes(rectangles: Layout) -> np.ndarray:
+    return rectangles.boxes if isinstance(rectangles, IntegerLayout) else rectangles
+
+# Rectangle IDs of a layout as int64
+def rectangle_ids(rectangles: Layout) -> np.ndarray:
+    if isinstance(rectangles, IntegerLayout):
+        return rectangles.ids.astype(np.int64, copy=False)
+    return rectangles[:, 0].astype(np.int64)
+
+def box_columns(boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return boxes[:, X1], boxes[:, Y1], boxes[:, X2], boxes[:, Y2]
+
+# Gap below which two edges touch: none on an integer grid, ABUTMENT_TOLERANCE for float coordinates
+def edge_tolerance(boxes: np.ndarray) -> float:
+    return 0 if np.issubdtype(boxes.dtype, np.integer) else ABUTMENT_TOLERANCE
+
+# Smallest of int32 and int64 holding values in [low, high]; a requested dtype is checked instead
+def integer_dtype(low: float, high: float, dtype=None) -> np.dtype:
+    if dtype is None:
+        dtype = np.int32 if -INT32_COORDINATE_LIMIT <= low and high <= INT32_COORDINATE_LIMIT else np.int64
+    dtype = np.dtype(dtype)
+    limit = INT32_COORDINATE_LIMIT if dtype == np.int32 else np.iinfo(dtype).max
+    if not np.issubdtype(dtype, np.integer) or low < -limit or high > limit:
+        raise ValueError(f"Coordinates in [{low:g}, {high:g}] do not fit in {dtype}")
+    return dtype
+
+# Snap a float layout to the integer grid of `dbu` database units per layout unit
+def quantize_rectangles(rectangles: np.ndarray, dbu: float = DEFAULT_DBU, dtype=None) -> IntegerLayout:
+    ids = rectangles[:, 0]
+    scaled = rectangles[:, 1:] * dbu
+    boxes = np.rint(scaled)
+    off_grid = (np.abs(scaled - boxes) > GRID_SNAP_TOLERANCE).any(axis=1) | (ids != np.rint(ids))
+    if off_grid.any():
+        raise ValueError(f"Rectangle {rectangles[np.argmax(off_grid), 0]:g} is not on the grid of {dbu:g} DBU per unit")
+    if not len(rectangles):
+        return IntegerLayout(np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=dtype or np.int32), dbu)
+    ids = ids.astype(integer_dtype(ids.min(), ids.max()))
+    return IntegerLayout(ids, boxes.astype(integer_dtype(boxes.min(), boxes.max(), dtype)), dbu)
+
+# Read rectangle data straight into integer mode: each parsed batch is snapped to the DBU grid, so no
+# float64 copy of the whole layout is ever held. Cached like read_rectangle_data, one sidecar per DBU scale.
+@measure_performance
+def read_integer_layout(filename: str, dbu: float = DEFAULT_DBU, dtype=None, chunk_size: int = READ_CHUNK_SIZE,
+                        use_cache: bool = True) -> IntegerLayout:
+    try:
+        ids_kind, boxes_kind = "rect_ids", f"rect_boxes_{dbu:g}"
+        if use_cache:
+            ids, boxes = load_cached_array(filename, ids_kind), load_cached_array(filename, boxes_kind)
+            if ids is not None and boxes is not None:
+                if dtype is not None and boxes.dtype != np.dtype(dtype):
+                    boxes = boxes.astype(integer_dtype(boxes.min(), boxes.max(), dtype)) if len(boxes) else boxes.astype(dtype)
+                print(f"Successfully loaded {len(ids)} rectangles from the binary cache.")
+                return IntegerLayout(ids, boxes, dbu)
+        parts = [quantize_rectangles(batch, dbu, np.int64) for batch in iter_rectangle_batches(filename, chunk_size)]
+        if not parts:
+            raise ValueError("No valid rectangle data found in the file")
+        ids = np.concatenate([part.ids.astype(np.int64) for part in parts])
+        boxes = np.concatenate([part.boxes for part in parts])
+        del parts
+        layout = IntegerLayout(ids.astype(integer_dtype(ids.min(), ids.max())),
+                               boxes.astype(integer_dtype(boxes.min(), boxes.max(), dtype), copy=False), dbu)
+        print(f"Successfully read {len(layout)} rectangles from the file.")
+        if use_cache:
+            store_cached_array(filename, ids_kind, layout.ids)
+            store_cached_array(filename, boxes_kind, layout.boxes)
+        return layout
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        return None
+
+# Above this many visible shapes, ID labels are skipped and SVG output is rasterized
+LABEL_DENSITY_LIMIT = 500
+
+# Rectangles whose boxes meet the viewport (x_min, y_min, x_max, y_max)
+def cull_to_viewport(rectangles: np.ndarray, viewport: Tuple[float, float, float, float]) -> np.ndarray:
+    x_min, y_min, x_max, y_max = viewport
+    visible = ((rectangles[:, 1] <= x_max) & (rectangles[:, 3] >= x_min) &
+               (rectangles[:, 2] <= y_max) & (rectangles[:, 4] >= y_min))
+    return rectangles[visible]
+
+# New figure: a pyplot window when interactive, or a detached Figure that needs no display when writing a file
+def new_figure(output: str = None, figsize: Tuple[float, float] = (12, 10)):
+    if output is None:
+        figure = plt.figure(figsize=figsize)
+    else:
+        figure = Figure(figsize=figsize)
+    return figure, figure.add_subplot()
+
+# Show the figure, or write it to a PNG/SVG file without opening a window
+def finish_figure(figure, output: str = None):
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output)
+        print(f"Saved plot to {output}")
+
+# Draw rectangles as one PolyCollection, labelling them only while the plot is sparse enough
+def draw_rectangles(axes, rectangles: np.ndarray, label_limit: int = LABEL_DENSITY_LIMIT):
     color_list = list(mcolors.TABLEAU_COLORS.values())
-    colors = [color_list[i % len(color_list)] for i in range(len(rectangles))]
-    for rect, color in zip(rectangles, colors):
-        rect_id, x1, y1, x2, y2 = rect
-        plt.gca().add_patch(plt.Rectangle((x1, y1), x2 - x1, y2 - y1, fill=False, edgecolor=color, linewidth=2))
-        plt.text((x1 + x2) / 2, (y1 + y2) / 2, f'{int(rect_id)}', horizontalalignment='center', verticalalignment='center', color=color, fontweight='bold')
+    colors = [color_list[i % len(color_list)] for i in range(min(len(rectangles), len(color_list)))]
+    _, x1, y1, x2, y2 = rectangles.T
+    corners = np.stack([np.column_stack(corner) for corner in ((x1, y1), (x2, y1), (x2, y2), (x1, y2))], axis=1)
+    dense = len(rectangles) > label_limit
+    axes.add_collection(PolyCollection(corners, facecolors='none', edgecolors=colors,
+                                       linewidths=0.5 if dense else 2, rasterized=dense))
+    if not dense:
+        for k, (rect_id, cx, cy) in enumerate(zip(rectangles[:, 0], (x1 + x2) / 2, (y1 + y2) / 2)):
+            axes.text(cx, cy, f'{int(rect_id)}', horizontalalignment='center', verticalalignment='center',
+                      color=colors[k % len(colors)], fontweight='bold')
+
+def _frame_axes(axes, rectangles: np.ndarray, title: str, viewport: Tuple[float, float, float, float] = None):
+    axes.set_title(title)
+    if viewport is not None:
+        x_min, y_min, x_max, y_max = viewport
+        padding = 0
+    else:
+        x_min, x_max = rectangles[:, [1, 3]].min(), rectangles[:, [1, 3]].max()
+        y_min, y_max = rectangles[:, [2, 4]].min(), rectangles[:, [2, 4]].max()
+        padding = (x_max - x_min) * 0.1
+    axes.set_xlim(x_min - padding, x_max + padding)
+    axes.set_ylim(y_min - padding, y_max + padding)
+    axes.set_xlabel('X coordinate')
+    axes.set_ylabel('Y coordinate')
+    axes.grid(True, linestyle='--', alpha=0.7)
+    axes.axis('equal')
+
+# Plot all rectangles on a graph; with output set, the plot is written to that file instead of shown
+def plot_rectangles(rectangles: np.ndarray, point: Tuple[float, float] = None, title: str = "Rectangles",
+                    output: str = None, viewport: Tuple[float, float, float, float] = None,
+                    label_limit: int = LABEL_DENSITY_LIMIT):
+    visible = rectangles if viewport is None else cull_to_viewport(rectangles, viewport)
+    figure, axes = new_figure(output)
+    draw_rectangles(axes, visible, label_limit)
     if point is not None:
-        plt.plot(point[0], point[1], 'ro', label='Point', markersize=10)
-        plt.legend()
-    all_x = rectangles[:, [1, 3]].flatten()
-    all_y = rectangles[:, [2, 4]].flatten()
-    padding = (max(all_x) - min(all_x)) * 0.1
-    plt.xlim(min(all_x) - padding, max(all_x) + padding)
-    plt.ylim(min(all_y) - padding, max(all_y) + padding)
-    plt.xlabel('X coordinate')
-    plt.ylabel('Y coordinate')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.axis('equal')
-    plt.show()
+        axes.plot(point[0], point[1], 'ro', label='Point', markersize=10)
+        axes.legend()
+    _frame_axes(axes, rectangles, title, viewport)
+    finish_figure(figure, output)
 
 # Plot only the rectangles with the specified IDs
-def plot_specific_rectangles(rectangles: np.ndarray, specific_ids: List[int], title: str = "Specific Rectangles"):
-    if not specific_ids:
+def plot_specific_rectangles(rectangles: np.ndarray, specific_ids: List[int], title: str = "Specific Rectangles",
+                             output: str = None, viewport: Tuple[float, float, float, float] = None,
+                             label_limit: int = LABEL_DENSITY_LIMIT):
+    if not len(specific_ids):
         print(f"No rectangles to plot for: {title}")
         return
-    plt.figure(figsize=(12, 10))
-    plt.title(title)
     specific_rects = rectangles[np.isin(rectangles[:, 0], specific_ids)]
-    color_list = list(mcolors.TABLEAU_COLORS.values())
-    colors = [color_list[i % len(color_list)] for i in range(len(specific_rects))]
-    for rect, color in zip(specific_rects, colors):
-        rect_id, x1, y1, x2, y2 = rect
-        plt.gca().add_patch(plt.Rectangle((x1, y1), x2-x1, y2-y1, fill=False, edgecolor=color, linewidth=2))
-        plt.text((x1+x2)/2, (y1+y2)/2, f'{int(rect_id)}', horizontalalignment='center', verticalalignment='center', color=color, fontweight='bold')
-    all_x = specific_rects[:, [1, 3]].flatten()
-    all_y = specific_rects[:, [2, 4]].flatten()
-    padding = (max(all_x) - min(all_x)) * 0.1
-    plt.xlim(min(all_x) - padding, max(all_x) + padding)
-    plt.ylim(min(all_y) - padding, max(all_y) + padding)
-    plt.xlabel('X coordinate')
-    plt.ylabel('Y coordinate')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.axis('equal')
-    plt.show()
+    visible = specific_rects if viewport is None else cull_to_viewport(specific_rects, viewport)
+    figure, axes = new_figure(output)
+    draw_rectangles(axes, visible, label_limit)
+    _frame_axes(axes, specific_rects, title, viewport)
+    finish_figure(figure, output)
 
 # Check if a point is inside a rectangle
 def is_point_in_rectangle(point: Tuple[float, float], rectangle: np.ndarray) -> bool:
-    _, x1, y1, x2, y2 = rectangle
+    x1, y1, x2, y2 = rectangle[X1:]
     x, y = point
     return x1 <= x <= x2 and y1 <= y <= y2
 
-# Find rectangles enclosing a point
+# Find IDs of rectangles enclosing a point; an integer layout takes the point in layout units and tests all boxes at once
 @measure_performance
-def find_enclosing_rectangles(rectangles: np.ndarray, point: Tuple[float, float]) -> str:
+def find_enclosing_rectangles(rectangles: Layout, point: Tuple[float, float]) -> np.ndarray:
+    if isinstance(rectangles, IntegerLayout):
+        x, y = point[0] * rectangles.dbu, point[1] * rectangles.dbu
+        x1, y1, x2, y2 = box_columns(rectangles.boxes)
+        return rectangle_ids(rectangles)[(x1 <= x) & (x <= x2) & (y1 <= y) & (y <= y2)]
     enclosed = [int(rect[0]) for rect in rectangles if is_point_in_rectangle(point, rect)]
-    return "{" + ", ".join(map(str, enclosed)) + "}" if enclosed else "{}"
+    return np.array(enclosed, dtype=np.int64)
 
 # Check if two rectangles overlap or touch
 def check_rectangle_overlap(rect1: np.ndarray, rect2: np.ndarray) -> bool:
-    _, x1_1, y1_1, x2_1, y2_1 = rect1
-    _, x1_2, y1_2, x2_2, y2_2 = rect2
+    x1_1, y1_1, x2_1, y2_1 = rect1[X1:]
+    x1_2, y1_2, x2_2, y2_2 = rect2[X1:]
     return not (x1_1 >= x2_2 or x2_1 <= x1_2 or y1_1 >= y2_2 or y2_1 <= y1_2)
 
 # Check if one rectangle is contained within another
 def is_rectangle_contained(rect1: np.ndarray, rect2: np.ndarray) -> bool:
-    _, x1_1, y1_1, x2_1, y2_1 = rect1
-    _, x1_2, y1_2, x2_2, y2_2 = rect2
+    x1_1, y1_1, x2_1, y2_1 = rect1[X1:]
+    x1_2, y1_2, x2_2, y2_2 = rect2[X1:]
     return x1_2 <= x1_1 and y1_2 <= y1_1 and x2_2 >= x2_1 and y2_2 >= y2_1
 
-# Find non-overlapping rectangles
-def find_non_overlapping_rectangles(rectangles: np.ndarray) -> str:
+# Find non-overlapping rectangles (reference O(n^2) loops)
+def find_non_overlapping_rectangles_reference(rectangles: np.ndarray) -> str:
     non_overlapping = set()
     for i, rect1 in enumerate(rectangles):
         has_overlap = False
@@ -137,8 +307,8 @@ def find_non_overlapping_rectangles(rectangles: np.ndarray) -> str:
             non_overlapping.add(int(rect1[0]))
     return "{" + ", ".join(map(str, sorted(non_overlapping))) + "}"
 
-# Find overlapping rectangles
-def find_overlapping_rectangles(rectangles: np.ndarray) -> str:
+# Find overlapping rectangles (reference O(n^2) loops)
+def find_overlapping_rectangles_reference(rectangles: np.ndarray) -> str:
     overlap_dict = {}
     for i, rect1 in enumerate(rectangles):
         rect1_id = int(rect1[0])
@@ -159,8 +329,8 @@ def find_overlapping_rectangles(rectangles: np.ndarray) -> str:
             processed.update(overlapping)
     return "{" + ", ".join(result) + "}" if result else "{}"
 
-# Find contained rectangles
-def find_contained_rectangles(rectangles: np.ndarray) -> str:
+# Find contained rectangles (reference O(n^2) loops)
+def find_contained_rectangles_reference(rectangles: np.ndarray) -> str:
     result = []
     for i, rect1 in enumerate(rectangles):
         contained_ids = [
@@ -171,70 +341,368 @@ def find_contained_rectangles(rectangles: np.ndarray) -> str:
             result.append(f"{{{int(rect1[0])}, {', '.join(map(str, contained_ids))}}}")
     return "{" + ", ".join(result) + "}" if result else "{}"
 
-# Find abutting rectangles
-def find_abutting_rectangles(rectangles: np.ndarray) -> str:
+# Sides of rect1 on which rect2 abuts it, as indices into ABUTMENT_DIRECTIONS
+def abutment_sides(rect1: np.ndarray, rect2: np.ndarray) -> List[int]:
+    x1_1, y1_1, x2_1, y2_1 = rect1[X1:]
+    x1_2, y1_2, x2_2, y2_2 = rect2[X1:]
+    x_overlap = x1_1 < x2_2 and x2_1 > x1_2
+    y_overlap = y1_1 < y2_2 and y2_1 > y1_2
+    sides = []
+    if x_overlap:
+        if abs(y2_1 - y1_2) < ABUTMENT_TOLERANCE:
+            sides.append(0)
+        elif abs(y1_1 - y2_2) < ABUTMENT_TOLERANCE:
+            sides.append(1)
+    if y_overlap:
+        if abs(x2_1 - x1_2) < ABUTMENT_TOLERANCE:
+            sides.append(2)
+        elif abs(x1_1 - x2_2) < ABUTMENT_TOLERANCE:
+            sides.append(3)
+    return sides
+
+# Find abutting rectangles (reference O(n^2) loops)
+def find_abutting_rectangles_reference(rectangles: np.ndarray) -> str:
     abutting_rectangles = []
     for i, rect1 in enumerate(rectangles):
         for j, rect2 in enumerate(rectangles):
             if i != j:
-                _, x1_1, y1_1, x2_1, y2_1 = rect1
-                _, x1_2, y1_2, x2_2, y2_2 = rect2
-                x_overlap = x1_1 < x2_2 and x2_1 > x1_2
-                y_overlap = y1_1 < y2_2 and y2_1 > y1_2
-                if x_overlap:
-                    if abs(y2_1 - y1_2) < 1e-10:
-                        abutting_rectangles.append(f"{{{int(rect1[0])}, 'n', {int(rect2[0])}}}")
-                    elif abs(y1_1 - y2_2) < 1e-10:
-                        abutting_rectangles.append(f"{{{int(rect1[0])}, 's', {int(rect2[0])}}}")
-                if y_overlap:
-                    if abs(x2_1 - x1_2) < 1e-10:
-                        abutting_rectangles.append(f"{{{int(rect1[0])}, 'e', {int(rect2[0])}}}")
-                    elif abs(x1_1 - x2_2) < 1e-10:
-                        abutting_rectangles.append(f"{{{int(rect1[0])}, 'w', {int(rect2[0])}}}")
+                for side in abutment_sides(rect1, rect2):
+                    abutting_rectangles.append(f"{{{int(rect1[0])}, '{ABUTMENT_DIRECTIONS[side]}', {int(rect2[0])}}}")
     return "{" + ", ".join(abutting_rectangles) + "}" if abutting_rectangles else "{}"
 
-# Main program with performance monitoring
+# Relations between every pair of rows using the scalar predicates (reference O(n^2) loops)
+def reference_relations(rectangles: Layout) -> dict:
+    rectangles = layout_boxes(rectangles)
+    overlap, contained, abutting = [], [], []
+    for i, rect1 in enumerate(rectangles):
+        for j, rect2 in enumerate(rectangles):
+            if i != j:
+                if i < j and check_rectangle_overlap(rect1, rect2):
+                    overlap.append((i, j))
+                if is_rectangle_contained(rect2, rect1):
+                    contained.append((i, j))
+                abutting.extend((i, side, j) for side in abutment_sides(rect1, rect2))
+    overlap = np.array(overlap, dtype=np.int64).reshape(-1, 2)
+    contained = np.array(contained, dtype=np.int64).reshape(-1, 2)
+    abutting = np.array(abutting, dtype=np.int64).reshape(-1, 3)
+    count("pairs_tested", len(rectangles) * (len(rectangles) - 1))
+    count("pairs_emitted", len(overlap) + len(contained) + len(abutting))
+    return {
+        "overlap": (overlap[:, 0], overlap[:, 1]),
+        "contained": (contained[:, 0], contained[:, 1]),
+        "abutting": (abutting[:, 0], abutting[:, 1].astype(np.int8), abutting[:, 2]),
+    }
+
+# Active y-intervals of the sweep line, stored in a segment tree over compressed y coordinates
+class ActiveIntervalSet:
+    def __init__(self, num_leaves: int):
+        self.num_leaves = num_leaves
+        self.size = 1
+        while self.size < max(num_leaves, 1):
+            self.size <<= 1
+        self.cover = [None] * (2 * self.size)
+        self.start_count = [0] * (2 * self.size)
+        self.starts = {}
+        self.spans = {}
+
+    # Canonical segment-tree nodes covering leaves lo..hi
+    def _canonical_nodes(self, lo: int, hi: int) -> List[int]:
+        nodes = []
+        left, right = lo + self.size, hi + self.size + 1
+        while left < right:
+            if left & 1:
+                nodes.append(left)
+                left += 1
+            if right & 1:
+                right -= 1
+                nodes.append(right)
+            left >>= 1
+            right >>= 1
+        return nodes
+
+    def insert(self, idx: int, lo: int, hi: int):
+        self.spans[idx] = (lo, hi)
+        for node in self._canonical_nodes(lo, hi):
+            if self.cover[node] is None:
+                self.cover[node] = set()
+            self.cover[node].add(idx)
+        self.starts.setdefault(lo, set()).add(idx)
+        node = lo + self.size
+        while node:
+            self.start_count[node] += 1
+            node >>= 1
+
+    def remove(self, idx: int):
+        lo, hi = self.spans.pop(idx)
+        for node in self._canonical_nodes(lo, hi):
+            self.cover[node].discard(idx)
+        self.starts[lo].discard(idx)
+        node = lo + self.size
+        while node:
+            self.start_count[node] -= 1
+            node >>= 1
+
+    # Active intervals whose leaf span lo..hi intersects leaves la..lb
+    def query(self, la: int, lb: int) -> List[int]:
+        found = []
+        if la < self.num_leaves:
+            node = la + self.size
+            while node:
+                if self.cover[node]:
+                    found.extend(idx for idx in self.cover[node] if self.spans[idx][0] <= lb)
+                node >>= 1
+        if la + 1 <= lb:
+            stack = self._canonical_nodes(la + 1, lb)
+            while stack:
+                node = stack.pop()
+                if not self.start_count[node]:
+                    continue
+                if node >= self.size:
+                    found.extend(self.starts[node - self.size])
+                else:
+                    stack.append(2 * node)
+                    stack.append(2 * node + 1)
+        return found
+
+# Sweep along x and return row-index pairs (i, j) whose boxes touch or intersect, grown by tolerance
+# (by default edge_tolerance: exact on integer boxes)
+def sweep_candidate_pairs(rectangles: Layout, tolerance: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    boxes = layout_boxes(rectangles)
+    n = len(boxes)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if tolerance is None:
+        tolerance = edge_tolerance(boxes)
+    x1, y1, x2, y2 = box_columns(boxes)
+    ys = np.unique(np.concatenate((y1, y2)))
+    lo = np.searchsorted(ys, y1, side='left')
+    hi = np.searchsorted(ys, y2, side='left')
+    query_lo = np.searchsorted(ys, y1 - tolerance, side='left')
+    query_hi = np.searchsorted(ys, y2 + tolerance, side='right') - 1
+    order = np.argsort(x1, kind='stable')
+    active = ActiveIntervalSet(len(ys))
+    expiry = []
+    first, second = [], []
+    for idx in order.tolist():
+        left_edge = x1[idx] - tolerance
+        while expiry and expiry[0][0] < left_edge:
+            active.remove(heapq.heappop(expiry)[1])
+        for other in active.query(int(query_lo[idx]), int(query_hi[idx])):
+            first.append(other)
+            second.append(idx)
+        active.insert(idx, int(lo[idx]), int(hi[idx]))
+        heapq.heappush(expiry, (x2[idx], idx))
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    return np.minimum(first, second), np.maximum(first, second)
+
+# Broadcast form of check_rectangle_overlap on (..., 5) float rows or (..., 4) integer boxes
+def overlap_kernel(rect1: np.ndarray, rect2: np.ndarray) -> np.ndarray:
+    return ~((rect1[..., X1] >= rect2[..., X2]) | (rect1[..., X2] <= rect2[..., X1]) |
+             (rect1[..., Y1] >= rect2[..., Y2]) | (rect1[..., Y2] <= rect2[..., Y1]))
+
+# Broadcast form of is_rectangle_contained (rect1 inside rect2)
+def contained_kernel(rect1: np.ndarray, rect2: np.ndarray) -> np.ndarray:
+    return ((rect2[..., X1] <= rect1[..., X1]) & (rect2[..., Y1] <= rect1[..., Y1]) &
+            (rect2[..., X2] >= rect1[..., X2]) & (rect2[..., Y2] >= rect1[..., Y2]))
+
+# Edges at the same coordinate: exact equality on integer boxes, within ABUTMENT_TOLERANCE for floats
+def edges_touch(edge1: np.ndarray, edge2: np.ndarray) -> np.ndarray:
+    if np.issubdtype(edge1.dtype, np.integer):
+        return edge1 == edge2
+    return np.abs(edge1 - edge2) < ABUTMENT_TOLERANCE
+
+# Broadcast form of the abutment test: (north, south, east, west) masks for rect2 relative to rect1
+def abutment_kernel(rect1: np.ndarray, rect2: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    x_overlap = (rect1[..., X1] < rect2[..., X2]) & (rect1[..., X2] > rect2[..., X1])
+    y_overlap = (rect1[..., Y1] < rect2[..., Y2]) & (rect1[..., Y2] > rect2[..., Y1])
+    north = x_overlap & edges_touch(rect1[..., Y2], rect2[..., Y1])
+    south = x_overlap & ~north & edges_touch(rect1[..., Y1], rect2[..., Y2])
+    east = y_overlap & edges_touch(rect1[..., X2], rect2[..., X1])
+    west = y_overlap & ~east & edges_touch(rect1[..., X1], rect2[..., X2])
+    return north, south, east, west
+
+# Any relation (overlap, containment or abutment) between rect1 and rect2, in either direction
+def related_kernel(rect1: np.ndarray, rect2: np.ndarray) -> np.ndarray:
+    related = overlap_kernel(rect1, rect2) | contained_kernel(rect1, rect2) | contained_kernel(rect2, rect1)
+    for mask in abutment_kernel(rect1, rect2) + abutment_kernel(rect2, rect1):
+        related |= mask
+    return related
+
+# Boolean adjacency matrix of a kernel between two blocks of rectangles
+def pairwise_matrix(block1: np.ndarray, block2: np.ndarray, kernel=overlap_kernel) -> np.ndarray:
+    return kernel(block1[:, None, :], block2[None, :, :])
+
+# COO pair lists (rows, cols) of a kernel over all rectangles, tile by tile to bound peak memory
+# With symmetric=True only pairs rows < cols are evaluated and reported
+def tiled_pairs(rectangles: np.ndarray, kernel=overlap_kernel, tile_size: int = DEFAULT_TILE_SIZE,
+                symmetric: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(rectangles)
+    rows, cols = [], []
+    for start1 in range(0, n, tile_size):
+        block1 = rectangles[start1:start1 + tile_size]
+        for start2 in range(start1 if symmetric else 0, n, tile_size):
+            block2 = rectangles[start2:start2 + tile_size]
+            matrix = pairwise_matrix(block1, block2, kernel)
+            if start1 == start2:
+                excluded = np.tri(len(block1), len(block2), dtype=bool) if symmetric else np.eye(len(block1), len(block2), dtype=bool)
+                matrix &= ~excluded
+            i, j = np.nonzero(matrix)
+            rows.append(i + start1)
+            cols.append(j + start2)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows).astype(np.int64), np.concatenate(cols).astype(np.int64)
+
+# Classify candidate pairs into overlap, containment and abutment relations
+def classify_candidate_pairs(rectangles: Layout, first: np.ndarray, second: np.ndarray) -> dict:
+    boxes = layout_boxes(rectangles)
+    a, b = boxes[first], boxes[second]
+    overlap = overlap_kernel(a, b)
+    b_in_a = contained_kernel(b, a)
+    a_in_b = contained_kernel(a, b)
+    abut_rows, abut_cols, abut_codes = [], [], []
+    # Both orders of each pair, in the order the reference loops emit them
+    for rows, cols, rect1, rect2 in ((first, second, a, b), (second, first, b, a)):
+        north, south, east, west = abutment_kernel(rect1, rect2)
+        for code, mask in enumerate((north, south, east, west)):
+            abut_rows.append(rows[mask])
+            abut_cols.append(cols[mask])
+            abut_codes.append(np.full(int(mask.sum()), code, dtype=np.int8))
+    abut_rows = np.concatenate(abut_rows)
+    abut_cols = np.concatenate(abut_cols)
+    abut_codes = np.concatenate(abut_codes)
+    # n/s entries come before e/w entries for the same ordered pair
+    abut_order = np.lexsort((abut_codes // 2, abut_cols, abut_rows))
+    count("pairs_emitted", int(overlap.sum() + b_in_a.sum() + a_in_b.sum()) + len(abut_rows))
+    return {
+        "overlap": (first[overlap], second[overlap]),
+        "contained": (np.concatenate((first[b_in_a], second[a_in_b])), np.concatenate((second[b_in_a], first[a_in_b]))),
+        "abutting": (abut_rows[abut_order], abut_codes[abut_order], abut_cols[abut_order]),
+    }
+
+# Run the sweep and classify every touching pair of rectangles
+def sweep_relations(rectangles: Layout) -> dict:
+    boxes = layout_boxes(rectangles)
+    first, second = sweep_candidate_pairs(boxes)
+    count("pairs_tested", len(first))
+    return classify_candidate_pairs(boxes, first, second)
+
+# Evaluate the broadcast kernels tile by tile and classify every related pair
+def vectorized_relations(rectangles: Layout, tile_size: int = DEFAULT_TILE_SIZE) -> dict:
+    boxes = layout_boxes(rectangles)
+    count("pairs_tested", len(boxes) * (len(boxes) - 1) // 2)
+    first, second = tiled_pairs(boxes, related_kernel, tile_size, symmetric=True)
+    return classify_candidate_pairs(boxes, first, second)
+
+# Analysis back-ends accepted by the find_* classifiers
+ANALYSIS_METHODS = ("sweep", "vectorized", "reference")
+
+def _check_method(method: str):
+    if method not in ANALYSIS_METHODS:
+        raise ValueError(f"Unknown analysis method '{method}', expected one of {ANALYSIS_METHODS}")
+
+# Relations of all three kinds from one analysis back-end. The find_* classifiers take a precomputed dict
+# (from sweep_relations, parallel_relations or a LayoutSession) so several of them can share one analysis.
+def _relations(rectangles: Layout, method: str, tile_size: int, relations: dict = None) -> dict:
+    _check_method(method)
+    if relations is not None:
+        return relations
+    if method == "reference":
+        return reference_relations(rectangles)
+    if method == "vectorized":
+        return vectorized_relations(rectangles, tile_size)
+    return sweep_relations(rectangles)
+
+# Typed results from the row-index relations, ordered like the reference loops
+def overlap_result(rectangles: Layout, first: np.ndarray, second: np.ndarray) -> OverlapPairs:
+    order = np.lexsort((second, first))
+    first, second = first[order], second[order]
+    ids = rectangle_ids(rectangles)
+    return OverlapPairs(ids[first], ids[second], first, second)
+
+def containment_result(rectangles: Layout, containers: np.ndarray, contained: np.ndarray) -> ContainmentPairs:
+    order = np.lexsort((contained, containers))
+    containers, contained = containers[order], contained[order]
+    ids = rectangle_ids(rectangles)
+    return ContainmentPairs(ids[containers], ids[contained], containers, contained)
+
+def abutment_result(rectangles: Layout, rows: np.ndarray, codes: np.ndarray, cols: np.ndarray) -> AbutmentPairs:
+    ids = rectangle_ids(rectangles)
+    return AbutmentPairs(ids[rows], codes, ids[cols], rows, cols)
+
+# Sorted IDs of the rows that appear in no overlap pair
+def non_overlapping_result(rectangles: Layout, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    has_overlap = np.zeros(len(rectangles), dtype=bool)
+    has_overlap[first] = True
+    has_overlap[second] = True
+    return np.unique(rectangle_ids(rectangles)[~has_overlap])
+
+# Find IDs of non-overlapping rectangles, sorted
+def find_non_overlapping_rectangles(rectangles: Layout, method: str = "sweep", tile_size: int = DEFAULT_TILE_SIZE,
+                                    relations: dict = None) -> np.ndarray:
+    return non_overlapping_result(rectangles, *_relations(rectangles, method, tile_size, relations)["overlap"])
+
+# Find overlapping rectangle pairs
+def find_overlapping_rectangles(rectangles: Layout, method: str = "sweep", tile_size: int = DEFAULT_TILE_SIZE,
+                                relations: dict = None) -> OverlapPairs:
+    return overlap_result(rectangles, *_relations(rectangles, method, tile_size, relations)["overlap"])
+
+# Find contained rectangle pairs
+def find_contained_rectangles(rectangles: Layout, method: str = "sweep", tile_size: int = DEFAULT_TILE_SIZE,
+                              relations: dict = None) -> ContainmentPairs:
+    return containment_result(rectangles, *_relations(rectangles, method, tile_size, relations)["contained"])
+
+# Find abutting rectangle pairs with the side they abut on
+def find_abutting_rectangles(rectangles: Layout, method: str = "sweep", tile_size: int = DEFAULT_TILE_SIZE,
+                             relations: dict = None) -> AbutmentPairs:
+    return abutment_result(rectangles, *_relations(rectangles, method, tile_size, relations)["abutting"])
+
+# Plot file for a title inside plot_dir, or None to show the plot interactively
+def plot_output(plot_dir: str, title: str) -> str:
+    if plot_dir is None:
+        return None
+    os.makedirs(plot_dir, exist_ok=True)
+    return os.path.join(plot_dir, title.lower().replace(' ', '_').replace('-', '_') + ".png")
+
+# Main program with performance monitoring; with plot_dir set, plots are written there instead of shown
 @measure_performance
-def main():
-    start_time = time.time()
+def main(plot_dir: str = None):
+    start_time = time.perf_counter()
     start_memory = measure_memory_usage()
     try:
         filename = input("Enter the filename: ")
         rectangles = read_rectangle_data(filename)
         if rectangles is not None:
-            plot_rectangles(rectangles, title="All Rectangles")
+            plot_rectangles(rectangles, title="All Rectangles", output=plot_output(plot_dir, "All Rectangles"))
             point = tuple(map(float, input("Enter point coordinates (x y): ").split()))
             enclosing_rectangles = find_enclosing_rectangles(rectangles, point)
-            print(f"Enclosing rectangles: {enclosing_rectangles}")
-            plot_rectangles(rectangles, point, title="Rectangles with Point")
-            non_overlapping = find_non_overlapping_rectangles(rectangles)
-            print(f"Non-overlapping rectangles: {non_overlapping}")
-            non_overlapping_ids = [int(x) for x in non_overlapping[1:-1].split(',') if x.strip()]
-            if non_overlapping_ids:
-                plot_specific_rectangles(rectangles, non_overlapping_ids, "Non-overlapping Rectangles")
-            overlapping_rectangles = find_overlapping_rectangles(rectangles)
-            print("Overlapping rectangles:", overlapping_rectangles)
-            overlapping_ids = []
-            for group in overlapping_rectangles.strip('{}').split('}, {'):
-                if group:
-                    ids = [int(x.strip()) for x in group.strip('{}').split(',')]
-                    overlapping_ids.extend(ids)
-            if overlapping_ids:
-                plot_specific_rectangles(rectangles, list(set(overlapping_ids)), "Overlapping Rectangles")
-            contained_rectangles = find_contained_rectangles(rectangles)
-            print("Contained rectangles:", contained_rectangles)
-            contained_ids = []
-            for group in contained_rectangles.strip('{}').split('}, {'):
-                if group:
-                    ids = [int(x.strip()) for x in group.strip('{}').split(',')]
-                    contained_ids.extend(ids)
-            if contained_ids:
-                plot_specific_rectangles(rectangles, list(set(contained_ids)), "Contained Rectangles")
-            abutting_rectangles = find_abutting_rectangles(rectangles)
-            print("Abutting rectangles:", abutting_rectangles)
+            print(f"Enclosing rectangles: {format_result(enclosing_rectangles)}")
+            plot_rectangles(rectangles, point, title="Rectangles with Point", output=plot_output(plot_dir, "Rectangles with Point"))
+            # One analysis feeds all four classifications
+            relations = sweep_relations(rectangles)
+            non_overlapping = find_non_overlapping_rectangles(rectangles, relations=relations)
+            print(f"Non-overlapping rectangles: {format_result(non_overlapping)}")
+            if len(non_overlapping):
+                plot_specific_rectangles(rectangles, non_overlapping.tolist(), "Non-overlapping Rectangles",
+                                         output=plot_output(plot_dir, "Non-overlapping Rectangles"))
+            overlapping_rectangles = find_overlapping_rectangles(rectangles, relations=relations)
+            print("Overlapping rectangles:", format_result(overlapping_rectangles))
+            overlapping_ids = result_ids(overlapping_rectangles)
+            if len(overlapping_ids):
+                plot_specific_rectangles(rectangles, overlapping_ids.tolist(), "Overlapping Rectangles",
+                                         output=plot_output(plot_dir, "Overlapping Rectangles"))
+            contained_rectangles = find_contained_rectangles(rectangles, relations=relations)
+            print("Contained rectangles:", format_result(contained_rectangles))
+            contained_ids = result_ids(contained_rectangles)
+            if len(contained_ids):
+                plot_specific_rectangles(rectangles, contained_ids.tolist(), "Contained Rectangles",
+                                         output=plot_output(plot_dir, "Contained Rectangles"))
+            abutting_rectangles = find_abutting_rectangles(rectangles, relations=relations)
+            print("Abutting rectangles:", format_result(abutting_rectangles))
     except Exception as e:
         print(f"An error occurred: {e}")
-    end_time = time.time()
+    end_time = time.perf_counter()
     end_memory = measure_memory_usage()
     print("\nOverall Performance Metrics:")
     print(f"Total execution time: {end_time - start_time:.4f} seconds")
@@ -242,4 +710,4 @@ def main():
     print(f"Current memory usage: {end_memory:.2f} MB")
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Iterator, List, NamedTuple, Optional
+from classify_rectangles import Layout, sweep_relations, layout_boxes, rectangle_ids, X1, Y1, X2, Y2, count
+
+# Union-find over rows 0..n-1 with array-backed parent and rank storage
+class DisjointSet:
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+        self.rank = np.zeros(n, dtype=np.int64)
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression: point every node on the way straight at the root
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return int(root)
+
+    # Union by rank: the shallower tree goes under the deeper one; False if a and b were already joined
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+        return True
+
+    # Union every pair of the two index streams in one pass; returns the number of merges made.
+    # The loop runs on list views of the arrays, which Python indexes much faster than NumPy scalars.
+    def union_pairs(self, first: np.ndarray, second: np.ndarray) -> int:
+        parent, rank = self.parent.tolist(), self.rank.tolist()
+        merges = 0
+        for a, b in zip(np.asarray(first).tolist(), np.asarray(second).tolist()):
+            root_a = a
+            while parent[root_a] != root_a:
+                root_a = parent[root_a]
+            while parent[a] != root_a:
+                parent[a], a = root_a, parent[a]
+            root_b = b
+            while parent[root_b] != root_b:
+                root_b = parent[root_b]
+            while parent[b] != root_b:
+                parent[b], b = root_b, parent[b]
+            if root_a == root_b:
+                continue
+            if rank[root_a] < rank[root_b]:
+                root_a, root_b = root_b, root_a
+            parent[root_b] = root_a
+            if rank[root_a] == rank[root_b]:
+                rank[root_a] += 1
+            merges += 1
+        self.parent[:] = parent
+        self.rank[:] = rank
+        return merges
+
+    # Root of every element, after compressing all paths at once
+    def roots(self) -> np.ndarray:
+        roots = self.parent.copy()
+        while True:
+            grand = roots[roots]
+            if np.array_equal(grand, roots):
+                return roots
+            roots = grand
+
+# Connected components of a layout; component k of rows labels == k spans boxes[k] = (x1, y1, x2, y2)
+class Components(NamedTuple):
+    labels: np.ndarray
+    sizes: np.ndarray
+    boxes: np.ndarray
+    layers: Optional[np.ndarray]
+
+# Components numbered 0..k-1 in order of their first row, with sizes and bounding boxes
+def components_from_roots(rectangles: Layout, roots: np.ndarray, layers: np.ndarray = None) -> Components:
+    _, first_row, labels = np.unique(roots, return_index=True, return_inverse=True)
+    renumber = np.empty(len(first_row), dtype=np.int64)
+    renumber[np.argsort(first_row, kind='stable')] = np.arange(len(first_row))
+    labels = renumber[labels]
+    k = len(first_row)
+    order = np.argsort(labels, kind='stable')
+    start = np.searchsorted(labels[order], np.arange(k))
+    shapes = layout_boxes(rectangles)
+    boxes = np.empty((k, 4), dtype=shapes.dtype)
+    if k:
+        boxes[:, 0] = np.minimum.reduceat(shapes[order, X1], start)
+        boxes[:, 1] = np.minimum.reduceat(shapes[order, Y1], start)
+        boxes[:, 2] = np.maximum.reduceat(shapes[order, X2], start)
+        boxes[:, 3] = np.maximum.reduceat(shapes[order, Y2], start)
+    component_layers = None
+    if layers is not None:
+        component_layers = np.empty(k, dtype=np.asarray(layers).dtype)
+        component_layers[labels] = layers
+    return Components(labels, np.bincount(labels, minlength=k), boxes, component_layers)
+
+# Transitively connected groups of shapes: rectangles are joined when they overlap (including containment)
+# or, with include_abutting, when they abut. With layers (one label per row), only shapes on the same layer
+# connect. relations may come from sweep_relations, parallel_relations or a LayoutSession.
+def find_connected_components(rectangles: Layout, include_abutting: bool = True, layers: np.ndarray = None,
+                              relations: dict = None) -> Components:
+    if relations is None:
+        relations = sweep_relations(rectangles)
+    streams = [relations["overlap"]]
+    if include_abutting:
+        rows, _, cols = relations["abutting"]
+        streams.append((rows, cols))
+    components = DisjointSet(len(rectangles))
+    merges = 0
+    for first, second in streams:
+        if layers is not None:
+            same_layer = np.asarray(layers)[first] == np.asarray(layers)[second]
+            first, second = first[same_layer], second[same_layer]
+        merges += components.union_pairs(first, second)
+    count("component_unions", merges)
+    return components_from_roots(rectangles, components.roots(), layers)
+
+# Rectangle IDs of each component, in component order
+def component_members(rectangles: Layout, components: Components) -> List[np.ndarray]:
+    order = np.argsort(components.labels, kind='stable')
+    ids = rectangle_ids(rectangles)[order]
+    return np.split(ids, np.cumsum(components.sizes)[:-1]) if len(ids) else []
+
+# Brace-format records, one per component: {component, size, {x1, y1, x2, y2}, {id, id, ...}}
+def iter_component_records(rectangles: Layout, components: Components) -> Iterator[str]:
+    for k, (members, box) in enumerate(zip(component_members(rectangles, components), components.boxes.tolist())):
+        layer = "" if components.layers is None else f"{components.layers[k]}, "
+        yield (f"{{{k}, {layer}{len(members)}, {{{box[0]:g}, {box[1]:g}, {box[2]:g}, {box[3]:g}}}, "
+               f"{{{', '.join(map(str, members.tolist()))}}}}}")
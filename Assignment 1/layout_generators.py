@@ -0,0 +1,79 @@
+import numpy as np
+from typing import Callable, Dict
+
+# Seed of the synthetic layout generators, so benchmark runs are repeatable
+LAYOUT_SEED = 2024
+
+# Rectangles are numbered 1..n and placed on the non-negative integer grid, as in the assignment's input files
+def _layout(x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray) -> np.ndarray:
+    ids = np.arange(1, len(x1) + 1, dtype=np.float64)
+    return np.column_stack((ids, x1, y1, x2, y2)).astype(np.float64)
+
+# Square die side for n shapes of the given mean size covering `density` of the area
+def _die_side(n: int, mean_size: float, density: float) -> int:
+    return max(1, int(np.ceil(np.sqrt(n * mean_size * mean_size / density))))
+
+# Random positions and sizes over the whole die
+def uniform_layout(n: int, seed: int = LAYOUT_SEED, mean_size: float = 10.0, density: float = 0.5) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    side = _die_side(n, mean_size, density)
+    width = rng.integers(1, 2 * int(mean_size), size=n, endpoint=True)
+    height = rng.integers(1, 2 * int(mean_size), size=n, endpoint=True)
+    x1 = rng.integers(0, side, size=n, endpoint=True)
+    y1 = rng.integers(0, side, size=n, endpoint=True)
+    return _layout(x1, y1, x1 + width, y1 + height)
+
+# Shapes bunched around Gaussian hotspots, so local densities (and pair counts) are much higher than uniform
+def clustered_layout(n: int, seed: int = LAYOUT_SEED, mean_size: float = 10.0, density: float = 0.5,
+                     hotspots: int = 16) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    side = _die_side(n, mean_size, density)
+    centres = rng.uniform(0.1 * side, 0.9 * side, size=(hotspots, 2))
+    spread = rng.uniform(0.02 * side, 0.08 * side, size=hotspots)
+    owner = rng.integers(0, hotspots, size=n)
+    corner = np.clip(np.rint(centres[owner] + rng.normal(size=(n, 2)) * spread[owner, None]), 0, side)
+    width = rng.integers(1, 2 * int(mean_size), size=n, endpoint=True)
+    height = rng.integers(1, 2 * int(mean_size), size=n, endpoint=True)
+    return _layout(corner[:, 0], corner[:, 1], corner[:, 0] + width, corner[:, 1] + height)
+
+# Standard-cell-like rows: cells a whole number of sites wide packed left to right (abutting, with occasional
+# gaps), rows stacked edge to edge, and a fraction of the shapes being pins placed inside cells
+def row_layout(n: int, seed: int = LAYOUT_SEED, row_height: int = 10, max_sites: int = 8, gap_probability: float = 0.1,
+               pin_fraction: float = 0.1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    pins = int(round(n * pin_fraction)) if n > 1 else 0
+    cells = n - pins
+    width = rng.integers(1, max_sites, size=cells, endpoint=True)
+    gap = np.where(rng.random(cells) < gap_probability, rng.integers(1, 3, size=cells, endpoint=True), 0)
+    row_length = max(int(max_sites), int(np.sqrt((width + gap).sum() * row_height)))
+    start = np.cumsum(width + gap) - (width + gap)
+    row = start // row_length
+    x1 = start - row * row_length
+    y1 = row * row_height
+    host = rng.integers(0, cells, size=pins) if cells else np.empty(0, dtype=np.int64)
+    pin_x = x1[host] + rng.integers(0, width[host])
+    pin_y = y1[host] + rng.integers(1, row_height - 3, size=pins, endpoint=True)
+    return _layout(np.concatenate((x1, pin_x)), np.concatenate((y1, pin_y)),
+                   np.concatenate((x1 + width, pin_x + 1)), np.concatenate((y1 + row_height, pin_y + 2)))
+
+LAYOUT_GENERATORS: Dict[str, Callable[..., np.ndarray]] = {
+    "uniform": uniform_layout,
+    "clustered": clustered_layout,
+    "rows": row_layout,
+}
+
+# A seeded synthetic layout as the (n, 5) array read_rectangle_data returns
+def generate_layout(n: int, distribution: str = "uniform", seed: int = LAYOUT_SEED) -> np.ndarray:
+    if distribution not in LAYOUT_GENERATORS:
+        raise ValueError(f"Unknown layout distribution '{distribution}', expected one of {', '.join(LAYOUT_GENERATORS)}")
+    return LAYOUT_GENERATORS[distribution](n, seed)
+
+# Write an integer-grid layout in the assignment's brace format, so it can be fed to main()
+def save_layout(path: str, rectangles: np.ndarray):
+    with open(path, 'w') as file:
+        file.write("{")
+        for start in range(0, len(rectangles), 65536):
+            rows = rectangles[start:start + 65536].astype(np.int64)
+            prefix = "" if start == 0 else ",\n"
+            file.write(prefix + ",\n".join(f"{{{r[0]}, {r[1]}, {r[2]}, {r[3]}, {r[4]}}}" for r in rows.tolist()))
+        file.write("}\n")
@@ -0,0 +1,319 @@
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import numpy as np
+from collections import deque
+from typing import Dict, List, Tuple, Union
+from urllib.parse import urlsplit, parse_qsl
+from classify_rectangles import (ABUTMENT_DIRECTIONS, Layout, read_rectangle_data, read_integer_layout, abutment_kernel,
+                                 layout_boxes, edge_tolerance, X1)
+from spatial_index import RectangleGridIndex, build_spatial_index
+from common.instrumentation import PROFILER, count
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Pending connections the listening socket queues, so bursts of clients are not refused
+SOCKET_BACKLOG = 1024
+
+# Requests answered per batch at most; whatever queued up while the previous batch ran goes into the next one
+MAX_BATCH = 4096
+
+# Latency samples kept per query kind for the percentiles
+LATENCY_SAMPLES = 100000
+LATENCY_PERCENTILES = (50, 90, 99)
+
+# Query kinds and the request parameters each one takes
+QUERY_PARAMETERS = {
+    "window": ("x1", "y1", "x2", "y2"),
+    "point": ("x", "y"),
+    "abuts": ("id",),
+}
+
+# Parameters that name a shape and must be integers; all others are finite coordinates
+INTEGER_PARAMETERS = {"id"}
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+# Vectorized answers for batches of queries against one loaded layout and its grid index
+class LayoutQueryService:
+    def __init__(self, rectangles: Layout, index: RectangleGridIndex):
+        self.rectangles = rectangles
+        self.index = index
+        self.id_order = np.argsort(index.ids, kind='stable')
+        self.sorted_ids = index.ids[self.id_order]
+
+    # Rows of the given rectangle IDs, -1 for unknown IDs
+    def rows_of(self, ids: np.ndarray) -> np.ndarray:
+        where = np.minimum(np.searchsorted(self.sorted_ids, ids), max(len(self.sorted_ids) - 1, 0))
+        found = (self.sorted_ids[where] == ids) if len(self.sorted_ids) else np.zeros(len(ids), dtype=bool)
+        return np.where(found, self.id_order[where], -1)
+
+    # IDs intersecting each window, with the check_rectangle_overlap test
+    def windows(self, windows: np.ndarray) -> List[list]:
+        offsets, rows = self.index.window_rows(windows)
+        return np.split(self.index.ids[rows], offsets[1:-1]) if len(windows) else []
+
+    # IDs enclosing each point, with the is_point_in_rectangle test
+    def points(self, points: np.ndarray) -> List[list]:
+        offsets, rows = self.index.point_rows(points)
+        return np.split(self.index.ids[rows], offsets[1:-1]) if len(points) else []
+
+    # (side, id) of every rectangle abutting each requested one, ordered like find_abutting_rectangles
+    def abutting(self, ids: np.ndarray) -> List[list]:
+        rows = self.rows_of(ids)
+        known = np.flatnonzero(rows >= 0)
+        boxes = layout_boxes(self.rectangles)
+        offsets, others = self.index.touching_rows(boxes[rows[known], X1:], edge_tolerance(boxes))
+        owner = np.repeat(np.arange(len(known)), np.diff(offsets))
+        first = rows[known][owner]
+        sides, partners, owners = [], [], []
+        for code, mask in enumerate(abutment_kernel(boxes[first], boxes[others])):
+            mask &= others != first
+            sides.append(np.full(int(mask.sum()), code, dtype=np.int8))
+            partners.append(others[mask])
+            owners.append(owner[mask])
+        sides, partners, owners = np.concatenate(sides), np.concatenate(partners), np.concatenate(owners)
+        order = np.lexsort((sides // 2, partners, owners))
+        sides, partners, owners = sides[order], partners[order], owners[order]
+        answers = [None] * len(ids)
+        split = np.cumsum(np.bincount(owners, minlength=len(known)))[:-1]
+        for k, side_group, partner_group in zip(known.tolist(), np.split(sides, split), np.split(partners, split)):
+            answers[k] = list(zip(side_group.tolist(), self.index.ids[partner_group].tolist()))
+        return answers
+
+    # Answers for a batch of (kind, parameters) queries, evaluated one vectorized call per kind
+    def answer(self, queries: List[Tuple[str, tuple]]) -> List[dict]:
+        answers = [None] * len(queries)
+        for kind in QUERY_PARAMETERS:
+            slots = [k for k, (query_kind, _) in enumerate(queries) if query_kind == kind]
+            if not slots:
+                continue
+            values = np.array([queries[k][1] for k in slots])
+            if kind == "window":
+                results = [{"ids": ids.tolist()} for ids in self.windows(values)]
+            elif kind == "point":
+                results = [{"ids": ids.tolist()} for ids in self.points(values)]
+            else:
+                results = [{"error": f"Unknown rectangle ID {int(rect_id)}"} if found is None else
+                           {"id": int(rect_id), "abutting": [{"side": ABUTMENT_DIRECTIONS[side], "id": other}
+                                                              for side, other in found]}
+                           for rect_id, found in zip(values[:, 0], self.abutting(values[:, 0].astype(np.int64)))]
+            for k, result in zip(slots, results):
+                answers[k] = result
+            count(f"{kind}_queries", len(slots))
+        return answers
+
+# Rolling per-kind latency samples and their percentiles
+class LatencyRecorder:
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.samples: Dict[str, deque] = {kind: deque(maxlen=samples) for kind in QUERY_PARAMETERS}
+        self.totals = {kind: 0 for kind in QUERY_PARAMETERS}
+
+    def record(self, kind: str, seconds: float):
+        self.samples[kind].append(seconds)
+        self.totals[kind] += 1
+
+    def summary(self) -> dict:
+        summary = {}
+        for kind, samples in self.samples.items():
+            if not samples:
+                continue
+            values = np.array(samples) * 1000
+            stats = {"count": self.totals[kind], "max_ms": float(values.max())}
+            for q, value in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES)):
+                stats[f"p{q}_ms"] = float(value)
+            summary[kind] = stats
+        return summary
+
+# Collects concurrent requests into batches and answers each batch off the event loop
+class QueryBatcher:
+    def __init__(self, service: LayoutQueryService, max_batch: int = MAX_BATCH):
+        self.service = service
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.latency = LatencyRecorder()
+        self.batches = 0
+        self.queries = 0
+
+    async def submit(self, kind: str, parameters: tuple) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, parameters, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            queries = [(kind, parameters) for kind, parameters, _, _ in batch]
+            try:
+                with PROFILER.section("LayoutQueryService.answer"):
+                    answers = await loop.run_in_executor(None, self.service.answer, queries)
+                failure = None
+            except Exception as e:
+                answers, failure = [None] * len(batch), e
+            done = time.perf_counter()
+            for (kind, _, future, received), answer in zip(batch, answers):
+                self.latency.record(kind, done - received)
+                if future.done():
+                    continue
+                if failure is None:
+                    future.set_result(answer)
+                else:
+                    future.set_exception(failure)
+            self.batches += 1
+            self.queries += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "rectangles": len(self.service.rectangles),
+            "queries": self.queries,
+            "batches": self.batches,
+            "mean_batch": self.queries / self.batches if self.batches else 0.0,
+            "latency": self.latency.summary(),
+        }
+
+# One query parameter: IDs must be whole numbers in the int64 range, coordinates finite numbers
+def parse_parameter(name: str, value) -> Union[int, float]:
+    if name in INTEGER_PARAMETERS:
+        # Going through str() rejects 42.7, 42.0, true and nan alike, whether from a query string or JSON
+        try:
+            number = int(str(value))
+        except ValueError:
+            raise ValueError(f"Parameter '{name}' must be an integer, got {value!r}")
+        if not -2 ** 63 <= number < 2 ** 63:
+            raise ValueError(f"Parameter '{name}' is out of range: {number}")
+        return number
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Parameter '{name}' must be a number, got {value!r}")
+    if not math.isfinite(number):
+        raise ValueError(f"Parameter '{name}' must be finite, got {value!r}")
+    return number
+
+# Query kind and parameters of a request, or a ValueError naming what is wrong with it
+def parse_query(path: str, parameters: dict) -> Tuple[str, tuple]:
+    kind = path.strip('/')
+    if kind not in QUERY_PARAMETERS:
+        raise LookupError(f"Unknown query '{path}', expected one of /{', /'.join(QUERY_PARAMETERS)} or /stats")
+    missing = [name for name in QUERY_PARAMETERS[kind] if name not in parameters]
+    if missing:
+        raise ValueError(f"Missing parameter '{missing[0]}' for /{kind}")
+    values = tuple(parse_parameter(name, parameters[name]) for name in QUERY_PARAMETERS[kind])
+    if kind == "window" and (values[0] > values[2] or values[1] > values[3]):
+        raise ValueError("Window corners must satisfy x1 <= x2 and y1 <= y2")
+    return kind, values
+
+# Minimal HTTP/1.1 front end: GET with query-string parameters, or POST with a JSON object body; JSON replies
+class LayoutQueryServer:
+    def __init__(self, batcher: QueryBatcher):
+        self.batcher = batcher
+
+    async def respond(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        if method not in ("GET", "POST"):
+            return 405, {"error": f"Method {method} not allowed"}
+        if url.path.strip('/') == "stats":
+            return 200, self.batcher.stats()
+        try:
+            parameters = dict(parse_qsl(url.query)) if method == "GET" else json.loads(body or b"{}")
+            if not isinstance(parameters, dict):
+                raise ValueError("Request body must be a JSON object")
+            kind, values = parse_query(url.path, parameters)
+        except LookupError as e:
+            return 404, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        try:
+            answer = await self.batcher.submit(kind, values)
+        except Exception as e:
+            return 500, {"error": f"Query failed: {e}"}
+        return (404 if "error" in answer else 200), answer
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, payload, keep_alive = 400, {"error": "Malformed request line"}, False
+                else:
+                    method, target, version = parts
+                    body = await reader.readexactly(int(headers.get('content-length', 0)))
+                    status, payload = await self.respond(method, target, body)
+                    keep_alive = version == "HTTP/1.1" and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                             f"\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+# Serve queries until cancelled, on a Unix socket when unix_path is set, otherwise on host:port
+async def serve(rectangles: Layout, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: str = None):
+    index = build_spatial_index(rectangles)
+    batcher = QueryBatcher(LayoutQueryService(rectangles, index))
+    server = LayoutQueryServer(batcher)
+    if unix_path:
+        listener = await asyncio.start_unix_server(server.handle, unix_path, backlog=SOCKET_BACKLOG)
+        print(f"Serving {len(rectangles)} rectangles on unix:{unix_path}")
+    else:
+        listener = await asyncio.start_server(server.handle, host, port, backlog=SOCKET_BACKLOG)
+        print(f"Serving {len(rectangles)} rectangles on http://{host}:{port}")
+    worker = asyncio.create_task(batcher.run())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        worker.cancel()
+        print_latency_report(batcher.stats())
+
+def print_latency_report(stats: dict):
+    print(f"\nServed {stats['queries']} queries in {stats['batches']} batches "
+          f"(mean batch {stats['mean_batch']:.1f}).")
+    for kind, latency in stats["latency"].items():
+        percentiles = ", ".join(f"p{q} {latency[f'p{q}_ms']:.3f} ms" for q in LATENCY_PERCENTILES)
+        print(f"  {kind:<6} {latency['count']:>9} queries: {percentiles}, max {latency['max_ms']:.3f} ms")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Keep a layout loaded and answer window, point-enclosure and "
+                                                 "abutment queries over HTTP.")
+    parser.add_argument("filename", help="rectangle file in the assignment's brace format")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--dbu", type=float, help="load in integer mode with this many database units per unit")
+    args = parser.parse_args(argv[1:])
+    if args.dbu:
+        rectangles = read_integer_layout(args.filename, args.dbu)
+    else:
+        rectangles = read_rectangle_data(args.filename)
+    if rectangles is None:
+        sys.exit(1)
+    try:
+        asyncio.run(serve(rectangles, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main(sys.argv)
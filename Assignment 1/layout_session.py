@@ -0,0 +1,262 @@
+import numpy as np
+from typing import Dict, Iterable, NamedTuple, Set, Tuple
+from classify_rectangles import (ABUTMENT_TOLERANCE, measure_performance, overlap_kernel, contained_kernel, abutment_kernel,
+                                 sweep_relations, overlap_result, containment_result, abutment_result, non_overlapping_result)
+
+# The session grid has levels, each LEVEL_SCALE times coarser than the one below. A shape is indexed on the
+# finest level where its box spans at most LEVEL_CELLS cells, so a die-sized shape touches a few coarse cells
+# and an edit visits a handful of cells per level rather than every large shape.
+LEVEL_CELLS = 64
+LEVEL_SCALE = 8
+
+# Relation of rectangle b to rectangle a, stored under links[a][b]
+class PairRelation(NamedTuple):
+    overlap: bool
+    contains: bool
+    sides: Tuple[int, ...]
+
+# Every distinct PairRelation, indexed by code = overlap + 2 * contains + 4 * north/south + 12 * east/west, where
+# the side digits are 0 (none), 1 (north or east) or 2 (south or west). Links share these instances.
+def _relation_of_code(code: int) -> PairRelation:
+    vertical, horizontal = (code // 4) % 3, code // 12
+    sides = ((), (0,), (1,))[vertical] + ((), (2,), (3,))[horizontal]
+    return PairRelation(bool(code & 1), bool(code & 2), sides)
+
+RELATIONS = tuple(_relation_of_code(code) for code in range(36))
+
+# Code of the side index of an abutment relation (north, south, east, west)
+SIDE_CODES = np.array([4, 8, 12, 24], dtype=np.int64)
+
+# Relation codes of each rect2 to rect1, as stored under links[rect1][rect2]; broadcasts like the kernels
+def relation_codes(rect1: np.ndarray, rect2: np.ndarray) -> np.ndarray:
+    north, south, east, west = abutment_kernel(rect1, rect2)
+    return (overlap_kernel(rect1, rect2) + 2 * contained_kernel(rect2, rect1) + 4 * (north + 2 * south) +
+            12 * (east + 2 * west)).astype(np.int64)
+
+# Rectangle set with a dynamic grid index and its current relations, updated in place by ECO edits
+class LayoutSession:
+    def __init__(self, rectangles: np.ndarray, cell_size: float = None):
+        if cell_size is None:
+            sizes = np.maximum(rectangles[:, 3] - rectangles[:, 1], rectangles[:, 4] - rectangles[:, 2]) if len(rectangles) else []
+            cell_size = float(np.median(sizes)) if len(sizes) else 1.0
+        self.cell_size = max(cell_size, 1e-9)
+        self.rects: Dict[int, np.ndarray] = {}
+        self.levels: Dict[int, Dict[Tuple[int, int], Set[int]]] = {}
+        self.level: Dict[int, int] = {}
+        self.links: Dict[int, Dict[int, PairRelation]] = {}
+        for rect in rectangles:
+            rect_id = int(rect[0])
+            if rect_id in self.rects:
+                raise ValueError(f"Duplicate rectangle ID {rect_id}")
+            self.rects[rect_id] = np.array(rect, dtype=np.float64)
+            self.links[rect_id] = {}
+        self._index_all(rectangles)
+        self._link_all(rectangles)
+
+    # Grid cells (cx1, cy1, cx2, cy2) covered by a box grown by the abutment tolerance on the given grid level;
+    # broadcasts over arrays
+    def _cell_span(self, x1, y1, x2, y2, level: int = 0) -> tuple:
+        size = self.cell_size * LEVEL_SCALE ** level
+        return ((x1 - ABUTMENT_TOLERANCE) // size, (y1 - ABUTMENT_TOLERANCE) // size,
+                (x2 + ABUTMENT_TOLERANCE) // size, (y2 + ABUTMENT_TOLERANCE) // size)
+
+    def _cells_of(self, rect: np.ndarray, level: int) -> Iterable[Tuple[int, int]]:
+        cx1, cy1, cx2, cy2 = map(int, self._cell_span(*rect[1:], level))
+        return ((cx, cy) for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1))
+
+    # Finest grid level on which the rectangle spans at most LEVEL_CELLS cells
+    def _level_of(self, rect: np.ndarray) -> int:
+        level = 0
+        while True:
+            cx1, cy1, cx2, cy2 = map(int, self._cell_span(*rect[1:], level))
+            if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) <= LEVEL_CELLS:
+                return level
+            level += 1
+
+    def _index(self, rect_id: int):
+        rect = self.rects[rect_id]
+        level = self._level_of(rect)
+        self.level[rect_id] = level
+        cells = self.levels.setdefault(level, {})
+        for cell in self._cells_of(rect, level):
+            cells.setdefault(cell, set()).add(rect_id)
+
+    # Bulk form of _index for the initial shapes: levels, then all cell entries of a level at once and one set
+    # per occupied cell
+    def _index_all(self, rectangles: np.ndarray):
+        ids = rectangles[:, 0].astype(np.int64)
+        pending = np.arange(len(rectangles))
+        level = 0
+        while len(pending):
+            span = self._cell_span(*rectangles[pending, 1:].T, level)
+            cx1, cy1, cx2, cy2 = (column.astype(np.int64) for column in span)
+            span_x = cx2 - cx1 + 1
+            counts = span_x * (cy2 - cy1 + 1)
+            fits = counts <= LEVEL_CELLS
+            self.level.update(dict.fromkeys(ids[pending[fits]].tolist(), level))
+            counts[~fits] = 0
+            rows = np.repeat(np.arange(len(pending), dtype=np.int64), counts)
+            offset = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            cell_x = cx1[rows] + offset % span_x[rows]
+            cell_y = cy1[rows] + offset // span_x[rows]
+            order = np.lexsort((cell_y, cell_x))
+            cell_x, cell_y, members = cell_x[order], cell_y[order], ids[pending[rows[order]]]
+            starts = np.flatnonzero(np.diff(cell_x, prepend=cell_x[:1] - 1) | np.diff(cell_y, prepend=cell_y[:1] - 1))
+            ends = np.append(starts[1:], len(members)).tolist()
+            members = members.tolist()
+            if len(members):
+                cells = self.levels.setdefault(level, {})
+                for start, end, cx, cy in zip(starts.tolist(), ends, cell_x[starts].tolist(), cell_y[starts].tolist()):
+                    cells[(cx, cy)] = set(members[start:end])
+            pending = pending[~fits]
+            level += 1
+
+    def _unindex(self, rect_id: int):
+        level = self.level.pop(rect_id)
+        cells = self.levels[level]
+        for cell in self._cells_of(self.rects[rect_id], level):
+            members = cells[cell]
+            members.discard(rect_id)
+            if not members:
+                del cells[cell]
+        if not cells:
+            del self.levels[level]
+
+    # Initial relations from one bulk sweep instead of per-shape inserts: each directed pair's code is the sum
+    # of its relation bits, and the reverse of every related pair gets at least the empty relation
+    def _link_all(self, rectangles: np.ndarray):
+        relations = sweep_relations(rectangles)
+        overlap_a, overlap_b = relations["overlap"]
+        contained_a, contained_b = relations["contained"]
+        abutting_a, sides, abutting_b = relations["abutting"]
+        first = np.concatenate((overlap_a, overlap_b, contained_a, abutting_a))
+        second = np.concatenate((overlap_b, overlap_a, contained_b, abutting_b))
+        bits = np.concatenate((np.ones(2 * len(overlap_a), dtype=np.int64), np.full(len(contained_a), 2, dtype=np.int64),
+                               SIDE_CODES[sides]))
+        n = max(len(rectangles), 1)
+        keys, inverse = np.unique(np.concatenate((first * n + second, second * n + first)), return_inverse=True)
+        codes = np.bincount(inverse, weights=np.concatenate((bits, np.zeros_like(bits))), minlength=len(keys))
+        ids = rectangles[:, 0].astype(np.int64)
+        for a, b, code in zip(ids[keys // n].tolist(), ids[keys % n].tolist(), codes.astype(np.int64).tolist()):
+            self.links[a][b] = RELATIONS[code]
+
+    # Shapes that may touch a rectangle: those sharing one of its grid cells on every occupied level. Where
+    # the rectangle covers more cells of a level than are occupied, that level's occupied cells are scanned.
+    def _neighbours(self, rect_id: int) -> Set[int]:
+        rect = self.rects[rect_id]
+        neighbours = set()
+        for level, cells in self.levels.items():
+            cx1, cy1, cx2, cy2 = map(int, self._cell_span(*rect[1:], level))
+            if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) <= len(cells):
+                for cell in self._cells_of(rect, level):
+                    neighbours.update(cells.get(cell, ()))
+            else:
+                for (cx, cy), members in cells.items():
+                    if cx1 <= cx <= cx2 and cy1 <= cy <= cy2:
+                        neighbours.update(members)
+        neighbours.discard(rect_id)
+        return neighbours
+
+    # Relate one rectangle to its neighbours, in both directions
+    def _link(self, rect_id: int):
+        neighbours = list(self._neighbours(rect_id))
+        if not neighbours:
+            return
+        rect = self.rects[rect_id]
+        others = np.array([self.rects[other_id] for other_id in neighbours])
+        forward = relation_codes(rect, others).tolist()
+        backward = relation_codes(others, rect).tolist()
+        links = self.links[rect_id]
+        for other_id, forward_code, backward_code in zip(neighbours, forward, backward):
+            if forward_code or backward_code:
+                links[other_id] = RELATIONS[forward_code]
+                self.links[other_id][rect_id] = RELATIONS[backward_code]
+
+    def _unlink(self, rect_id: int):
+        for other_id in self.links[rect_id]:
+            del self.links[other_id][rect_id]
+        self.links[rect_id] = {}
+
+    def insert(self, rect_id: int, x1: float, y1: float, x2: float, y2: float):
+        if rect_id in self.rects:
+            raise ValueError(f"Duplicate rectangle ID {rect_id}")
+        self.rects[rect_id] = np.array([rect_id, x1, y1, x2, y2], dtype=np.float64)
+        self.links[rect_id] = {}
+        self._index(rect_id)
+        self._link(rect_id)
+
+    def delete(self, rect_id: int):
+        self._unlink(rect_id)
+        self._unindex(rect_id)
+        del self.rects[rect_id]
+        del self.links[rect_id]
+
+    # Move or resize a rectangle; it keeps its position in the row order
+    def move(self, rect_id: int, x1: float, y1: float, x2: float, y2: float):
+        self._unlink(rect_id)
+        self._unindex(rect_id)
+        self.rects[rect_id][1:] = (x1, y1, x2, y2)
+        self._index(rect_id)
+        self._link(rect_id)
+
+    # Apply an ECO delta: deletes (IDs), then moves and inserts ((id, x1, y1, x2, y2) tuples)
+    @measure_performance
+    def apply_delta(self, deletes: Iterable[int] = (), moves: Iterable[tuple] = (), inserts: Iterable[tuple] = ()):
+        for rect_id in deletes:
+            self.delete(rect_id)
+        for rect_id, *coords in moves:
+            self.move(rect_id, *coords)
+        for rect_id, *coords in inserts:
+            self.insert(rect_id, *coords)
+
+    # Current rectangles as an (n, 5) array in session row order
+    def to_array(self) -> np.ndarray:
+        return np.array(list(self.rects.values()), dtype=np.float64).reshape(-1, 5)
+
+    # Current relations as row-index arrays, in the same form as sweep_relations
+    def relations(self) -> dict:
+        rows = {rect_id: row for row, rect_id in enumerate(self.rects)}
+        overlap, contained, abutting = [], [], []
+        for a, partners in self.links.items():
+            for b, relation in partners.items():
+                if relation.overlap and rows[a] < rows[b]:
+                    overlap.append((rows[a], rows[b]))
+                if relation.contains:
+                    contained.append((rows[a], rows[b]))
+                abutting.extend((rows[a], side, rows[b]) for side in relation.sides)
+        overlap = np.array(overlap, dtype=np.int64).reshape(-1, 2)
+        contained = np.array(contained, dtype=np.int64).reshape(-1, 2)
+        abutting = np.array(abutting, dtype=np.int64).reshape(-1, 3)
+        order = np.lexsort((abutting[:, 1] // 2, abutting[:, 2], abutting[:, 0]))
+        abutting = abutting[order]
+        return {
+            "overlap": (overlap[:, 0], overlap[:, 1]),
+            "contained": (contained[:, 0], contained[:, 1]),
+            "abutting": (abutting[:, 0], abutting[:, 1].astype(np.int8), abutting[:, 2]),
+        }
+
+    # The four classifications of the current layout, as returned by the find_* functions
+    def results(self) -> dict:
+        rectangles = self.to_array()
+        relations = self.relations()
+        return {
+            "non_overlapping": non_overlapping_result(rectangles, *relations["overlap"]),
+            "overlapping": overlap_result(rectangles, *relations["overlap"]),
+            "contained": containment_result(rectangles, *relations["contained"]),
+            "abutting": abutment_result(rectangles, *relations["abutting"]),
+        }
+
+    # Compare the incrementally maintained relations with a full recompute of the current layout
+    @measure_performance
+    def check_consistency(self) -> bool:
+        rectangles = self.to_array()
+        incremental = self.relations()
+        full = sweep_relations(rectangles)
+        consistent = True
+        for key in ("overlap", "contained", "abutting"):
+            ours = set(zip(*(column.tolist() for column in incremental[key])))
+            theirs = set(zip(*(column.tolist() for column in full[key])))
+            if ours != theirs:
+                consistent = False
+                print(f"Inconsistent {key} relations: {len(ours - theirs)} extra, {len(theirs - ours)} missing")
+        return consistent
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Tuple
+from classify_rectangles import (ABUTMENT_TOLERANCE, Layout, IntegerLayout, measure_performance, layout_boxes, box_columns,
+                                 sweep_relations, overlap_result, containment_result, abutment_result,
+                                 non_overlapping_result)
+from common.instrumentation import PROFILER, stop_inherited_tracing
+
+# Tiles per worker when the tiling is chosen automatically
+TILES_PER_WORKER = 4
+
+# Arrays the worker processes attach to in shared memory, set by _attach_shared_arrays
+_shared = {}
+
+# Uniform tiling of the die bounding box; every rectangle is listed in each tile its box meets, grown by the halo
+def build_tiles(rectangles: np.ndarray, tiles_per_side: int, halo: float) -> Tuple[np.ndarray, np.ndarray]:
+    x1, y1, x2, y2 = box_columns(rectangles)
+    x0, y0 = x1.min(), y1.min()
+    tile_w = max((x2.max() - x0) / tiles_per_side, 1e-12)
+    tile_h = max((y2.max() - y0) / tiles_per_side, 1e-12)
+    def tile_range(lo, hi, origin, size):
+        first = np.clip(((lo - halo - origin) // size).astype(np.int64), 0, tiles_per_side - 1)
+        last = np.clip(((hi + halo - origin) // size).astype(np.int64), 0, tiles_per_side - 1)
+        return first, last
+    tx1, tx2 = tile_range(x1, x2, x0, tile_w)
+    ty1, ty2 = tile_range(y1, y2, y0, tile_h)
+    span_x = tx2 - tx1 + 1
+    counts = span_x * (ty2 - ty1 + 1)
+    rows = np.repeat(np.arange(len(rectangles), dtype=np.int64), counts)
+    offset = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    tile_ids = (ty1[rows] + offset // span_x[rows]) * tiles_per_side + tx1[rows] + offset % span_x[rows]
+    order = np.argsort(tile_ids, kind='stable')
+    tile_start = np.zeros(tiles_per_side * tiles_per_side + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tile_ids, minlength=tiles_per_side * tiles_per_side), out=tile_start[1:])
+    return tile_start, rows[order]
+
+def _share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, tuple]:
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def _attach_shared_arrays(specs: dict):
+    stop_inherited_tracing()
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _shared[key] = (block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+
+# Classify one tile in a worker; relations are returned as global row indices
+def _analyze_tile(tile: int) -> dict:
+    boxes = _shared["boxes"][1]
+    tile_start = _shared["tile_start"][1]
+    members = _shared["tile_members"][1][tile_start[tile]:tile_start[tile + 1]]
+    PROFILER.counters.clear()
+    relations = sweep_relations(boxes[members])
+    first, second = relations["overlap"]
+    containers, contained = relations["contained"]
+    rows, codes, cols = relations["abutting"]
+    return {
+        "overlap": (members[first], members[second]),
+        "contained": (members[containers], members[contained]),
+        "abutting": (members[rows], codes, members[cols]),
+        "counters": dict(PROFILER.counters),
+    }
+
+# Merge per-tile relations, dropping pairs reported by more than one tile
+def merge_tile_relations(parts: list) -> dict:
+    def unique_columns(columns):
+        stacked = np.unique(np.column_stack([np.concatenate(column).astype(np.int64) for column in columns]), axis=0)
+        return tuple(stacked[:, k] for k in range(stacked.shape[1]))
+    overlap = unique_columns([[p["overlap"][k] for p in parts] for k in range(2)])
+    contained = unique_columns([[p["contained"][k] for p in parts] for k in range(2)])
+    rows, codes, cols = unique_columns([[p["abutting"][k] for p in parts] for k in range(3)])
+    order = np.lexsort((codes // 2, cols, rows))
+    return {
+        "overlap": (np.minimum(*overlap), np.maximum(*overlap)),
+        "contained": contained,
+        "abutting": (rows[order], codes[order].astype(np.int8), cols[order]),
+    }
+
+# Overlap, containment and abutment relations computed tile by tile across a process pool; integer layouts
+# share only their boxes with the workers
+def parallel_relations(rectangles: Layout, workers: int = None, tiles_per_side: int = None,
+                       halo: float = ABUTMENT_TOLERANCE) -> dict:
+    workers = workers or os.cpu_count() or 1
+    if tiles_per_side is None:
+        tiles_per_side = max(1, int(np.ceil(np.sqrt(workers * TILES_PER_WORKER))))
+    boxes = np.ascontiguousarray(layout_boxes(rectangles), dtype=None if isinstance(rectangles, IntegerLayout) else np.float64)
+    if len(boxes) == 0:
+        return sweep_relations(boxes)
+    tile_start, tile_members = build_tiles(boxes, tiles_per_side, max(halo, ABUTMENT_TOLERANCE))
+    blocks, specs = [], {}
+    try:
+        for key, array in (("boxes", boxes), ("tile_start", tile_start), ("tile_members", tile_members)):
+            block, specs[key] = _share_array(array)
+            blocks.append(block)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_arrays, initargs=(specs,)) as pool:
+            tiles = [t for t in range(tiles_per_side * tiles_per_side) if tile_start[t + 1] > tile_start[t]]
+            parts = list(pool.map(_analyze_tile, tiles))
+        for part in parts:
+            for name, amount in part["counters"].items():
+                PROFILER.count(name, amount)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return merge_tile_relations(parts)
+
+# All four classifications of a layout from one parallel pass, matching the serial find_* results
+@measure_performance
+def analyze_layout_parallel(rectangles: Layout, workers: int = None, tiles_per_side: int = None) -> dict:
+    relations = parallel_relations(rectangles, workers, tiles_per_side)
+    return {
+        "non_overlapping": non_overlapping_result(rectangles, *relations["overlap"]),
+        "overlapping": overlap_result(rectangles, *relations["overlap"]),
+        "contained": containment_result(rectangles, *relations["contained"]),
+        "abutting": abutment_result(rectangles, *relations["abutting"]),
+    }
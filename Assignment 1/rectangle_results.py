@@ -0,0 +1,137 @@
+import io
+import json
+import numpy as np
+from typing import NamedTuple, Iterator, Union, TextIO
+
+# Side of the first rectangle on which the second one abuts, indexed by the direction codes
+ABUTMENT_DIRECTIONS = ('n', 's', 'e', 'w')
+
+# Records written per write() call by the streaming formatters
+WRITE_BATCH_SIZE = 65536
+
+# Overlapping pairs; each unordered pair appears once with first_rows < second_rows
+class OverlapPairs(NamedTuple):
+    first: np.ndarray
+    second: np.ndarray
+    first_rows: np.ndarray
+    second_rows: np.ndarray
+
+# Containment pairs: rectangle `contained` lies inside rectangle `container`
+class ContainmentPairs(NamedTuple):
+    container: np.ndarray
+    contained: np.ndarray
+    container_rows: np.ndarray
+    contained_rows: np.ndarray
+
+# Abutment triples: rectangle `second` abuts rectangle `first` on side ABUTMENT_DIRECTIONS[direction]
+class AbutmentPairs(NamedTuple):
+    first: np.ndarray
+    direction: np.ndarray
+    second: np.ndarray
+    first_rows: np.ndarray
+    second_rows: np.ndarray
+
+RectangleResult = Union[np.ndarray, OverlapPairs, ContainmentPairs, AbutmentPairs]
+
+# Every rectangle ID mentioned by a result, e.g. to select the shapes to plot
+def result_ids(result: RectangleResult) -> np.ndarray:
+    if isinstance(result, np.ndarray):
+        return np.unique(result)
+    if isinstance(result, ContainmentPairs):
+        return np.unique(np.concatenate((result.container, result.contained)))
+    return np.unique(np.concatenate((result.first, result.second)))
+
+# Text records in the assignment's brace format, in the order the reference loops print them
+def iter_text_records(result: RectangleResult) -> Iterator[str]:
+    if isinstance(result, np.ndarray):
+        yield from map(str, result.tolist())
+    elif isinstance(result, OverlapPairs):
+        partners = {}
+        rows = np.concatenate((result.first_rows, result.second_rows))
+        order = np.argsort(rows, kind='stable')
+        owners = np.concatenate((result.first, result.second))[order].tolist()
+        others = np.concatenate((result.second, result.first))[order].tolist()
+        for owner, other in zip(owners, others):
+            partners.setdefault(owner, set()).add(other)
+        processed = set()
+        for rect_id, overlapping in partners.items():
+            if rect_id not in processed:
+                yield f"{{{rect_id}, {', '.join(map(str, sorted(overlapping)))}}}"
+                processed.add(rect_id)
+                processed.update(overlapping)
+    elif isinstance(result, ContainmentPairs):
+        current, members = None, []
+        for container, contained in zip(result.container.tolist(), result.contained.tolist()):
+            if members and container != current:
+                yield f"{{{current}, {', '.join(members)}}}"
+                members = []
+            current = container
+            members.append(str(contained))
+        if members:
+            yield f"{{{current}, {', '.join(members)}}}"
+    else:
+        for first, direction, second in zip(result.first.tolist(), result.direction.tolist(), result.second.tolist()):
+            yield f"{{{first}, '{ABUTMENT_DIRECTIONS[direction]}', {second}}}"
+
+# JSON objects, one per relation
+def iter_json_records(result: RectangleResult) -> Iterator[dict]:
+    if isinstance(result, np.ndarray):
+        for rect_id in result.tolist():
+            yield {"id": rect_id}
+    elif isinstance(result, OverlapPairs):
+        for first, second in zip(result.first.tolist(), result.second.tolist()):
+            yield {"first": first, "second": second}
+    elif isinstance(result, ContainmentPairs):
+        for container, contained in zip(result.container.tolist(), result.contained.tolist()):
+            yield {"container": container, "contained": contained}
+    else:
+        for first, direction, second in zip(result.first.tolist(), result.direction.tolist(), result.second.tolist()):
+            yield {"first": first, "side": ABUTMENT_DIRECTIONS[direction], "second": second}
+
+# Packed structured array of the ID columns, as written by the binary format
+def result_to_records(result: RectangleResult) -> np.ndarray:
+    if isinstance(result, np.ndarray):
+        records = np.empty(len(result), dtype=[('id', np.int64)])
+        records['id'] = result
+        return records
+    columns = [name for name in result._fields if not name.endswith('_rows')]
+    records = np.empty(len(result[0]), dtype=[(name, np.int8 if name == 'direction' else np.int64) for name in columns])
+    for name in columns:
+        records[name] = getattr(result, name)
+    return records
+
+def _write_batched(file: TextIO, pieces: Iterator[str]):
+    batch = []
+    for piece in pieces:
+        batch.append(piece)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            file.write(''.join(batch))
+            batch = []
+    file.write(''.join(batch))
+
+# Stream a result to an open file as 'text' (brace format), 'jsonl' or 'binary' (.npy records)
+def write_result(file, result: RectangleResult, fmt: str = 'text'):
+    if fmt == 'text':
+        def pieces():
+            yield "{"
+            for k, record in enumerate(iter_text_records(result)):
+                yield record if k == 0 else ", " + record
+            yield "}"
+        _write_batched(file, pieces())
+    elif fmt == 'jsonl':
+        _write_batched(file, (json.dumps(record) + "\n" for record in iter_json_records(result)))
+    elif fmt == 'binary':
+        np.save(file, result_to_records(result))
+    else:
+        raise ValueError(f"Unknown output format '{fmt}', expected 'text', 'jsonl' or 'binary'")
+
+# Write a result to a path, opening it in the mode its format needs
+def save_result(path: str, result: RectangleResult, fmt: str = 'text'):
+    with open(path, 'wb' if fmt == 'binary' else 'w') as file:
+        write_result(file, result, fmt)
+
+# The brace-format text of a result as a string, for console output of small layouts
+def format_result(result: RectangleResult) -> str:
+    buffer = io.StringIO()
+    write_result(buffer, result, 'text')
+    return buffer.getvalue()
@@ -0,0 +1,156 @@
+import numpy as np
+from typing import Tuple
+from classify_rectangles import (Layout, IntegerLayout, measure_performance, is_point_in_rectangle, overlap_kernel,
+                                 layout_boxes, rectangle_ids, box_columns, X1, Y1, X2, Y2)
+
+# Shapes spanning more grid cells than this are kept out of the cells, in one list that every query checks,
+# so a die-sized shape costs one entry instead of one per cell
+LARGE_SHAPE_CELLS = 64
+
+# Uniform grid over the layout bounding box; each cell lists the rectangles touching it (CSR layout).
+# Over an IntegerLayout the origin and cell size are whole database units, so cell lookup stays in integers;
+# query points are given in layout units and scaled by the DBU. Oversized shapes live in large_rows instead.
+class RectangleGridIndex:
+    def __init__(self, rectangles: Layout, rects_per_cell: float = 4.0):
+        self.boxes = layout_boxes(rectangles)
+        self.ids = rectangle_ids(rectangles)
+        self.scale = rectangles.dbu if isinstance(rectangles, IntegerLayout) else 1
+        integer = np.issubdtype(self.boxes.dtype, np.integer)
+        n = len(self.boxes)
+        x1, y1, x2, y2 = box_columns(self.boxes)
+        self.x0 = x1.min().item() if n else 0
+        self.y0 = y1.min().item() if n else 0
+        width = max(x2.max().item() - self.x0, 1e-12) if n else 1.0
+        height = max(y2.max().item() - self.y0, 1e-12) if n else 1.0
+        # Cells roughly the size of a typical shape, capped so the grid stays O(n)
+        typical = np.median(np.maximum(x2 - x1, y2 - y1)) if n else 1.0
+        target_cells = max(n / rects_per_cell, 1.0)
+        cell = max(typical, np.sqrt(width * height / target_cells), 1e-12)
+        self.cell_size = max(1, int(np.ceil(cell))) if integer else float(cell)
+        self.nx = int(width // cell) + 1
+        self.ny = int(height // cell) + 1
+        cx1, cy1 = self._cell_of(x1, y1)
+        cx2, cy2 = self._cell_of(x2, y2)
+        span_x = cx2 - cx1 + 1
+        span_y = cy2 - cy1 + 1
+        counts = span_x * span_y
+        large = counts > LARGE_SHAPE_CELLS
+        self.large_rows = np.flatnonzero(large)
+        counts[large] = 0
+        rows = np.repeat(np.arange(n, dtype=np.int64), counts)
+        offset = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_x = cx1[rows] + offset % span_x[rows]
+        cell_y = cy1[rows] + offset // span_x[rows]
+        cell_ids = cell_y * self.nx + cell_x
+        order = np.argsort(cell_ids, kind='stable')
+        self.cell_members = rows[order]
+        self.cell_start = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_ids, minlength=self.nx * self.ny), out=self.cell_start[1:])
+        print(f"Indexed {n} rectangles into a {self.nx}x{self.ny} grid ({len(rows)} cell entries, "
+              f"{len(self.large_rows)} large shapes).")
+
+    def _cell_of(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cx = np.clip(((x - self.x0) // self.cell_size).astype(np.int64), 0, self.nx - 1)
+        cy = np.clip(((y - self.y0) // self.cell_size).astype(np.int64), 0, self.ny - 1)
+        return cx, cy
+
+    # Add every large shape as a candidate of each of m queries, keeping candidates sorted by row per query
+    def _with_large_rows(self, owner: np.ndarray, rows: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not len(self.large_rows):
+            return owner, rows
+        owner = np.concatenate((owner, np.repeat(np.arange(m, dtype=np.int64), len(self.large_rows))))
+        rows = np.concatenate((rows, np.tile(self.large_rows, m)))
+        order = np.lexsort((rows, owner))
+        return owner[order], rows[order]
+
+    # Rows enclosing each of the (m, 2) points, given in layout units, as CSR arrays: rows[offsets[k]:offsets[k + 1]]
+    def point_rows(self, points: np.ndarray, batch_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        points = np.asarray(points, dtype=float).reshape(-1, 2) * self.scale
+        hits_per_point = np.zeros(len(points), dtype=np.int64)
+        hit_rows = []
+        for start in range(0, len(points), batch_size):
+            px = points[start:start + batch_size, 0]
+            py = points[start:start + batch_size, 1]
+            cx, cy = self._cell_of(px, py)
+            cells = cy * self.nx + cx
+            begin = self.cell_start[cells]
+            counts = self.cell_start[cells + 1] - begin
+            owner = np.repeat(np.arange(len(px), dtype=np.int64), counts)
+            slot = np.arange(len(owner), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+            rows = self.cell_members[np.repeat(begin, counts) + slot]
+            owner, rows = self._with_large_rows(owner, rows, len(px))
+            # Same closed-boundary test as is_point_in_rectangle
+            rx1, ry1, rx2, ry2 = (self.boxes[rows, k] for k in (X1, Y1, X2, Y2))
+            inside = (rx1 <= px[owner]) & (px[owner] <= rx2) & (ry1 <= py[owner]) & (py[owner] <= ry2)
+            hits_per_point[start:start + len(px)] = np.bincount(owner[inside], minlength=len(px))
+            hit_rows.append(rows[inside])
+        offsets = np.zeros(len(points) + 1, dtype=np.int64)
+        np.cumsum(hits_per_point, out=offsets[1:])
+        rows = np.concatenate(hit_rows) if hit_rows else np.empty(0, dtype=np.int64)
+        return offsets, rows
+
+    # Enclosing rectangle IDs for each of the (m, 2) points as CSR arrays: ids[offsets[k]:offsets[k + 1]]
+    @measure_performance(items_arg=1)
+    def query_points(self, points: np.ndarray, batch_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        offsets, rows = self.point_rows(points, batch_size)
+        return offsets, self.ids[rows]
+
+    # Enclosing rectangle IDs of a single point, like find_enclosing_rectangles
+    def query_point(self, point: Tuple[float, float]) -> np.ndarray:
+        point = (point[0] * self.scale, point[1] * self.scale)
+        cx, cy = self._cell_of(np.array([point[0]]), np.array([point[1]]))
+        cell = int(cy[0] * self.nx + cx[0])
+        rows = self.cell_members[self.cell_start[cell]:self.cell_start[cell + 1]]
+        rows = np.sort(np.concatenate((rows, self.large_rows)))
+        enclosed = [int(self.ids[row]) for row in rows if is_point_in_rectangle(point, self.boxes[row])]
+        return np.array(enclosed, dtype=np.int64)
+
+    # Rows whose boxes touch or intersect each of the (m, 4) boxes grown by `grow`, in index units, as CSR
+    # arrays sorted by row within each box: rows[offsets[k]:offsets[k + 1]]
+    def touching_rows(self, boxes: np.ndarray, grow: float = 0) -> Tuple[np.ndarray, np.ndarray]:
+        lo_x, lo_y = boxes[:, 0] - grow, boxes[:, 1] - grow
+        hi_x, hi_y = boxes[:, 2] + grow, boxes[:, 3] + grow
+        cx1, cy1 = self._cell_of(lo_x, lo_y)
+        cx2, cy2 = self._cell_of(hi_x, hi_y)
+        span_x = cx2 - cx1 + 1
+        counts = span_x * (cy2 - cy1 + 1)
+        owner = np.repeat(np.arange(len(boxes), dtype=np.int64), counts)
+        offset = np.arange(len(owner), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (cy1[owner] + offset // span_x[owner]) * self.nx + cx1[owner] + offset % span_x[owner]
+        begin = self.cell_start[cells]
+        members = self.cell_start[cells + 1] - begin
+        owner = np.repeat(owner, members)
+        slot = np.arange(len(owner), dtype=np.int64) - np.repeat(np.cumsum(members) - members, members)
+        rows = self.cell_members[np.repeat(begin, members) + slot]
+        owner, rows = self._with_large_rows(owner, rows, len(boxes))
+        # A box spanning several cells is found once per cell
+        pairs = np.unique(owner * max(len(self.boxes), 1) + rows)
+        owner, rows = pairs // max(len(self.boxes), 1), pairs % max(len(self.boxes), 1)
+        x1, y1, x2, y2 = (self.boxes[rows, k] for k in (X1, Y1, X2, Y2))
+        touching = (x1 <= hi_x[owner]) & (x2 >= lo_x[owner]) & (y1 <= hi_y[owner]) & (y2 >= lo_y[owner])
+        offsets = np.zeros(len(boxes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owner[touching], minlength=len(boxes)), out=offsets[1:])
+        return offsets, rows[touching]
+
+    # Rows intersecting each of the (m, 4) [x1, y1, x2, y2] windows, given in layout units, as CSR arrays.
+    # Same strict test as check_rectangle_overlap: shapes that only touch the window's edge are not reported.
+    def window_rows(self, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        windows = np.asarray(windows, dtype=float).reshape(-1, 4) * self.scale
+        offsets, rows = self.touching_rows(windows)
+        owner = np.repeat(np.arange(len(windows), dtype=np.int64), np.diff(offsets))
+        overlapping = overlap_kernel(windows[owner], self.boxes[rows])
+        counts = np.bincount(owner[overlapping], minlength=len(windows))
+        offsets = np.zeros(len(windows) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets, rows[overlapping]
+
+    # IDs of the rectangles intersecting each window as CSR arrays: ids[offsets[k]:offsets[k + 1]]
+    @measure_performance(items_arg=1)
+    def query_windows(self, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        offsets, rows = self.window_rows(windows)
+        return offsets, self.ids[rows]
+
+# Build a grid index once from the array returned by read_rectangle_data
+@measure_performance
+def build_spatial_index(rectangles: Layout, rects_per_cell: float = 4.0) -> RectangleGridIndex:
+    return RectangleGridIndex(rectangles, rects_per_cell)
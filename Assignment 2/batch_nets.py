@@ -0,0 +1,187 @@
+import os
+import sys
+import csv
+import tempfile
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from optimal_steiner_tree import (READ_CHUNK_SIZE, iter_input_batches, find_optimal_trunk, build_trunk_tree,
+                                  trunk_skew_profile, optimize_clock_x, measure_performance)
+from common.instrumentation import PROFILER, count, stop_inherited_tracing
+
+# Nets handed to a worker per task, and tasks kept in flight per worker while the input streams in
+NETS_PER_TASK = 256
+TASKS_IN_FLIGHT = 4
+
+# Per-net result columns, in output order
+RESULT_COLUMNS = ('net', 'sinks', 'trunk_x1', 'trunk_y', 'trunk_x2', 'wirelength', 'max_delay', 'skew', 'clock_x', 'clock_y')
+
+# Result rows copied into the .npy file per step when it is finalized
+NPY_COPY_ROWS = 65536
+
+def iter_net_files(path):
+    # The input file itself, or every .txt file of a directory in name order
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith('.txt') and os.path.isfile(os.path.join(path, name))]
+
+def split_nets(batches):
+    # Regroups a stream of number batches into nets, each its sink count n followed by 2n coordinates;
+    # brace grouping is not needed since every net announces its own length
+    parts, have, need = [], 0, None
+    for batch in batches:
+        start = 0
+        while start < len(batch):
+            if need is None:
+                sinks = batch[start]
+                if sinks < 0 or sinks != int(sinks):
+                    raise ValueError(f"Invalid sink count {sinks}")
+                need = 1 + 2 * int(sinks)
+            take = min(need - have, len(batch) - start)
+            parts.append(batch[start:start + take])
+            have += take
+            start += take
+            if have == need:
+                yield np.concatenate(parts)
+                parts, have, need = [], 0, None
+    if parts:
+        raise ValueError(f"Truncated net: expected {need - 1} coordinates, found {have - 1}")
+
+def iter_nets(path, chunk_size=READ_CHUNK_SIZE):
+    # Streams (name, nodes) for every net of a multi-net file or directory; nodes is the {n, x1, y1, ...}
+    # array that find_optimal_trunk takes. Unreadable or malformed files are reported and skipped.
+    for filename in iter_net_files(path):
+        base = os.path.basename(filename)
+        try:
+            for index, nodes in enumerate(split_nets(iter_input_batches(filename, chunk_size))):
+                yield f"{base}:{index}", nodes
+        except (OSError, ValueError) as e:
+            print(f"Error reading nets from '{filename}': {e}")
+
+def analyze_net(nodes):
+    # Problem 1 and 2 results for one net, without plots or console output
+    n = int(nodes[0])
+    if n == 0:
+        return (0,) + (np.nan,) * 8
+    trunk, node_coords, _ = find_optimal_trunk.__wrapped__(nodes)
+    clock_x, skew = optimize_clock_x(trunk_skew_profile(node_coords, trunk))
+    tree = build_trunk_tree(node_coords, trunk, clock_x)
+    return (n, trunk[0], trunk[1], trunk[2], tree.wirelength(), float(tree.sink_delays().max()), skew, clock_x, trunk[1])
+
+def analyze_nets(task):
+    # One worker task: result rows for a list of (name, nodes), plus the profiler counters it produced
+    PROFILER.counters.clear()
+    rows = [(name,) + analyze_net(nodes) for name, nodes in task]
+    count("nets_analyzed", len(rows))
+    return rows, dict(PROFILER.counters)
+
+def iter_tasks(nets, nets_per_task):
+    task = []
+    for net in nets:
+        task.append(net)
+        if len(task) == nets_per_task:
+            yield task
+            task = []
+    if task:
+        yield task
+
+class CsvResultWriter:
+    # Streams result rows to a CSV file as they arrive
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(RESULT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+class NpyResultWriter:
+    # Streams result rows to temporary files as they arrive, the numeric columns as fixed-width float64 records
+    # and the net names one per line. Since the name field's width is only known at the end, close() then
+    # copies both, a block at a time, into one structured .npy array whose fields are the result columns.
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        self.values = tempfile.TemporaryFile(dir=directory)
+        self.names = tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='\n', dir=directory)
+        self.rows = 0
+        self.width = 1
+
+    def write(self, rows):
+        if not rows:
+            return
+        np.array([row[1:] for row in rows], dtype=np.float64).tofile(self.values)
+        self.names.writelines(row[0] + '\n' for row in rows)
+        self.width = max(self.width, max(len(row[0]) for row in rows))
+        self.rows += len(rows)
+
+    def close(self):
+        dtype = [('net', f'U{self.width}'), ('sinks', np.int64)] + [(name, np.float64) for name in RESULT_COLUMNS[2:]]
+        columns = len(RESULT_COLUMNS) - 1
+        try:
+            if self.rows == 0:
+                np.save(self.path, np.empty(0, dtype=dtype))
+                return
+            output = np.lib.format.open_memmap(self.path, mode='w+', dtype=dtype, shape=(self.rows,))
+            self.values.seek(0)
+            self.names.seek(0)
+            for start in range(0, self.rows, NPY_COPY_ROWS):
+                values = np.fromfile(self.values, dtype=np.float64, count=NPY_COPY_ROWS * columns).reshape(-1, columns)
+                block = output[start:start + len(values)]
+                block['net'] = [self.names.readline()[:-1] for _ in range(len(values))]
+                for k, name in enumerate(RESULT_COLUMNS[1:]):
+                    block[name] = values[:, k]
+            output.flush()
+            del output
+        finally:
+            self.values.close()
+            self.names.close()
+
+RESULT_WRITERS = {'.csv': CsvResultWriter, '.npy': NpyResultWriter}
+
+# Routes and times every net of a file or directory, writing one result row per net to a .csv or .npy file
+@measure_performance
+def run_batch(path, output, workers=None, nets_per_task=NETS_PER_TASK):
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in RESULT_WRITERS:
+        raise ValueError(f"Unknown output format '{extension}', expected one of {', '.join(RESULT_WRITERS)}")
+    workers = workers or os.cpu_count() or 1
+    writer = RESULT_WRITERS[extension](output)
+    nets = 0
+    def collect(result):
+        rows, counters = result
+        writer.write(rows)
+        for name, amount in counters.items():
+            PROFILER.count(name, amount)
+        return len(rows)
+    try:
+        tasks = iter_tasks(iter_nets(path), nets_per_task)
+        if workers == 1:
+            for task in tasks:
+                nets += collect(analyze_nets(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=stop_inherited_tracing) as pool:
+                pending = deque()
+                for task in tasks:
+                    pending.append(pool.submit(analyze_nets, task))
+                    if len(pending) >= workers * TASKS_IN_FLIGHT:
+                        nets += collect(pending.popleft().result())
+                while pending:
+                    nets += collect(pending.popleft().result())
+    finally:
+        writer.close()
+    print(f"Analyzed {nets} nets; results written to {output}")
+    return nets
+
+def main(argv):
+    if len(argv) < 3:
+        print(f"Usage: {argv[0]} <net file or directory> <output.csv|output.npy> [workers]")
+        sys.exit(2)
+    run_batch(argv[1], argv[2], int(argv[3]) if len(argv) > 3 else None)
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
+from optimal_steiner_tree import (SteinerTree, build_trunk_tree, trunk_skew_profile, optimize_clock_x, plot_output,
+                                  measure_performance, LABEL_DENSITY_LIMIT)
+from common.instrumentation import stop_inherited_tracing
+
+# Seed of the synthetic sink generator, so benchmark runs are repeatable
+SINK_SEED = 2024
+
+# Sinks generated by main when no count is given
+DEFAULT_SINKS = 200
+
+# Above this many sinks, automatic clustering uses the grid instead of k-means
+KMEANS_SINK_LIMIT = 200000
+
+# Point-by-centroid distances evaluated per k-means block
+KMEANS_BLOCK_ENTRIES = 1 << 22
+
+# Above this many sinks, main skips the full-die plot
+PLOT_SINK_LIMIT = 100000
+
+def generate_sinks(n, seed=SINK_SEED, extent=1000.0, distribution="uniform", hotspots=16):
+    # Random sink coordinates on an extent x extent die, either "uniform" or "clustered" around Gaussian hotspots
+    rng = np.random.default_rng(seed)
+    if distribution == "uniform":
+        return rng.uniform(0.0, extent, size=(n, 2))
+    if distribution == "clustered":
+        centres = rng.uniform(0.1 * extent, 0.9 * extent, size=(hotspots, 2))
+        spread = rng.uniform(0.02 * extent, 0.08 * extent, size=hotspots)
+        owner = rng.integers(0, hotspots, size=n)
+        return np.clip(centres[owner] + rng.normal(size=(n, 2)) * spread[owner, None], 0.0, extent)
+    raise ValueError(f"Unknown sink distribution '{distribution}', expected 'uniform' or 'clustered'")
+
+def grid_clusters(points, clusters):
+    # Labels from a uniform grid of about `clusters` cells over the bounding box, numbered densely
+    x_min, y_min = points.min(axis=0)
+    width, height = np.maximum(points.max(axis=0) - (x_min, y_min), 1e-12)
+    nx = max(1, int(round(np.sqrt(clusters * width / height))))
+    ny = max(1, int(np.ceil(clusters / nx)))
+    cx = np.minimum(((points[:, 0] - x_min) / width * nx).astype(np.int64), nx - 1)
+    cy = np.minimum(((points[:, 1] - y_min) / height * ny).astype(np.int64), ny - 1)
+    return np.unique(cy * nx + cx, return_inverse=True)[1]
+
+def kmeans_clusters(points, clusters, iterations=10):
+    # Lloyd's k-means seeded with the grid clustering; distances are computed block by block as
+    # |p|^2 - 2 p.c + |c|^2 so each block is one matrix product
+    labels = grid_clusters(points, clusters)
+    k = labels.max() + 1
+    block = max(1, KMEANS_BLOCK_ENTRIES // k)
+    point_norms = np.einsum('ij,ij->i', points, points)
+    for _ in range(iterations):
+        sizes = np.bincount(labels, minlength=k)
+        centroids = np.column_stack([np.bincount(labels, weights=points[:, d], minlength=k) for d in range(2)])
+        centroids /= np.maximum(sizes, 1)[:, None]
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        updated = np.empty_like(labels)
+        for start in range(0, len(points), block):
+            distances = centroid_norms - 2 * points[start:start + block] @ centroids.T
+            distances += point_norms[start:start + block, None]
+            # Empty clusters keep their slot but never attract points
+            distances[:, sizes == 0] = np.inf
+            updated[start:start + block] = np.argmin(distances, axis=1)
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return np.unique(labels, return_inverse=True)[1]
+
+@measure_performance
+def cluster_sinks(points, clusters=None, method="auto", iterations=10):
+    # Cluster labels 0..k-1 per sink; about sqrt(n) clusters unless a count is given
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if clusters is None:
+        clusters = max(1, int(round(np.sqrt(len(points)))))
+    if method == "auto":
+        method = "kmeans" if len(points) <= KMEANS_SINK_LIMIT else "grid"
+    if method == "grid":
+        return grid_clusters(points, clusters)
+    if method == "kmeans":
+        return kmeans_clusters(points, clusters, iterations)
+    raise ValueError(f"Unknown clustering method '{method}', expected 'auto', 'grid' or 'kmeans'")
+
+def cluster_trunks(points, labels):
+    # Median trunk of every cluster at once, as find_optimal_trunk builds it for one net: (k, 4) rows of
+    # {x1, y_median, x2, y_median}, with the median taken over each cluster's sorted y values
+    order = np.lexsort((points[:, 1], labels))
+    sorted_labels = labels[order]
+    k = int(sorted_labels[-1]) + 1
+    start = np.searchsorted(sorted_labels, np.arange(k))
+    size = np.bincount(labels, minlength=k)
+    ys = points[order, 1]
+    y_median = (ys[start + (size - 1) // 2] + ys[start + size // 2]) / 2
+    xs = points[order, 0]
+    return np.column_stack((np.minimum.reduceat(xs, start), y_median, np.maximum.reduceat(xs, start), y_median))
+
+def _build_cluster_batch(batch):
+    return [build_trunk_tree(coords, trunk, spine_x) for coords, trunk, spine_x in batch]
+
+def join_cluster_trees(cluster_trees, cluster_y, cluster_rows, spine_x, tap_y, n_sinks):
+    # One tree from the cluster trees: a vertical spine at spine_x, rooted at tap_y, with a Steiner point
+    # at every cluster trunk's y from which that cluster's tree (rooted on the spine) hangs
+    levels = np.unique(cluster_y)
+    tap_y = min(max(tap_y, levels[0]), levels[-1])
+    split = int(np.searchsorted(levels, tap_y, side='left'))
+    cluster_level = np.searchsorted(levels, cluster_y)
+    tree_sizes = np.array([len(tree) for tree in cluster_trees], dtype=np.int64)
+    block_sizes = 1 + np.bincount(cluster_level, weights=tree_sizes, minlength=len(levels)).astype(np.int64)
+    # Preorder: root, the spine walking down from the tap, then walking up, as in build_trunk_tree
+    chain = np.concatenate((np.arange(split - 1, -1, -1), np.arange(split, len(levels))))
+    level_node = np.empty(len(levels), dtype=np.int64)
+    level_node[chain] = 1 + np.cumsum(block_sizes[chain]) - block_sizes[chain]
+    total = 1 + int(block_sizes.sum())
+    x, y = np.empty(total), np.empty(total)
+    parent = np.empty(total, dtype=np.int64)
+    edge_length, node_cap = np.zeros(total), np.zeros(total)
+    subtree_end = np.arange(1, total + 1)
+    sink_nodes = np.empty(n_sinks, dtype=np.int64)
+    x[0], y[0], parent[0], subtree_end[0] = spine_x, tap_y, -1, total
+    index = np.arange(len(levels))
+    x[level_node], y[level_node] = spine_x, levels
+    parent[level_node] = np.where(index >= split, level_node[np.maximum(index - 1, 0)],
+                                  level_node[np.minimum(index + 1, len(levels) - 1)])
+    parent[level_node[[p for p in (split - 1, split) if 0 <= p < len(levels)]]] = 0
+    edge_length[level_node] = np.abs(levels - y[parent[level_node]])
+    left_end = 1 + int(block_sizes[:split].sum())
+    subtree_end[level_node] = np.where(index < split, left_end, total)
+    next_free = level_node + 1
+    for tree, level, rows in zip(cluster_trees, cluster_level.tolist(), cluster_rows):
+        offset = int(next_free[level])
+        span = slice(offset, offset + len(tree))
+        next_free[level] += len(tree)
+        x[span], y[span] = tree.x, tree.y
+        parent[span] = tree.parent + offset
+        parent[offset] = level_node[level]
+        edge_length[span] = tree.edge_length
+        edge_length[offset] = abs(tree.x[0] - spine_x) + abs(tree.y[0] - levels[level])
+        node_cap[span] = tree.node_cap
+        subtree_end[span] = tree.subtree_end + offset
+        sink_nodes[rows] = tree.sink_nodes + offset
+    return SteinerTree(x, y, parent, edge_length, node_cap, subtree_end, sink_nodes)
+
+@measure_performance
+def build_multi_trunk_tree(points, labels, workers=None):
+    # Multi-trunk Steiner tree: a median trunk per cluster, extended to a shared vertical spine placed at
+    # the median of the trunk ends (which minimizes the total extension), with the clock tap on the spine.
+    # Cluster trees are built across a process pool when more than one worker is available.
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    trunks = cluster_trunks(points, labels)
+    spine_x = float(np.median(trunks[:, [0, 2]]))
+    trunks[:, 0] = np.minimum(trunks[:, 0], spine_x)
+    trunks[:, 2] = np.maximum(trunks[:, 2], spine_x)
+    order = np.argsort(labels, kind='stable')
+    cluster_rows = np.split(order, np.cumsum(np.bincount(labels))[:-1])
+    tasks = [(points[rows], tuple(trunk), spine_x) for rows, trunk in zip(cluster_rows, trunks.tolist())]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        batches = [tasks[k::workers] for k in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=stop_inherited_tracing) as pool:
+            built = list(pool.map(_build_cluster_batch, batches))
+        cluster_trees = [None] * len(tasks)
+        for k, trees in enumerate(built):
+            cluster_trees[k::workers] = trees
+    else:
+        cluster_trees = _build_cluster_batch(tasks)
+    spine_y = float(np.median(trunks[:, 1]))
+    tree = join_cluster_trees(cluster_trees, trunks[:, 1], cluster_rows, spine_x, spine_y, len(points))
+    spine = (spine_x, float(trunks[:, 1].min()), spine_x, float(trunks[:, 1].max()))
+    return tree, trunks, spine
+
+def single_trunk_tree(points):
+    # The problem 1 heuristic on the whole sink set, with the clock tap placed for minimum skew
+    y_median = float(np.median(points[:, 1]))
+    trunk = (float(points[:, 0].min()), y_median, float(points[:, 0].max()), y_median)
+    clock_x, _ = optimize_clock_x(trunk_skew_profile(points, trunk))
+    return build_trunk_tree(points, trunk, clock_x), trunk
+
+def plot_multi_trunk_tree(points, labels, tree, output=None, viewport=None, label_limit=LABEL_DENSITY_LIMIT):
+    # Plots the clustered tree, sinks coloured by cluster; writes to output (PNG/SVG) without a window when given
+    if output is None:
+        figure = plt.figure(figsize=(12, 10))
+    else:
+        figure = Figure(figsize=(12, 10))
+    axes = figure.add_subplot()
+    wired = np.flatnonzero(tree.edge_length > 0)
+    lines = np.stack((np.column_stack((tree.x[tree.parent[wired]], tree.y[tree.parent[wired]])),
+                      np.column_stack((tree.x[wired], tree.y[wired]))), axis=1)
+    is_steiner = np.ones(len(tree), dtype=bool)
+    is_steiner[tree.sink_nodes] = False
+    is_steiner[0] = False
+    steiner = np.column_stack((tree.x[is_steiner], tree.y[is_steiner]))
+    if viewport is not None:
+        x_min, y_min, x_max, y_max = viewport
+        lines = lines[(lines[:, :, 0].min(axis=1) <= x_max) & (lines[:, :, 0].max(axis=1) >= x_min) &
+                      (lines[:, :, 1].min(axis=1) <= y_max) & (lines[:, :, 1].max(axis=1) >= y_min)]
+        def inside(xy):
+            return (xy[:, 0] >= x_min) & (xy[:, 0] <= x_max) & (xy[:, 1] >= y_min) & (xy[:, 1] <= y_max)
+        shown = inside(points)
+        points, labels = points[shown], labels[shown]
+        steiner = steiner[inside(steiner)]
+    dense = len(lines) > label_limit
+    axes.add_collection(LineCollection(lines, colors='tab:blue', linewidths=0.3 if dense else 1.5, rasterized=dense))
+    marker_size = 2 if dense else 30
+    axes.scatter(points[:, 0], points[:, 1], s=marker_size, c=labels % 20, cmap='tab20', label='Nodes', zorder=3,
+                 rasterized=dense)
+    if not dense:
+        axes.scatter(steiner[:, 0], steiner[:, 1], s=marker_size / 2, color='tab:orange', marker='s',
+                     label='Steiner points', zorder=3)
+    axes.scatter([tree.x[0]], [tree.y[0]], s=150, marker='*', color='tab:purple', label='Clock generator', zorder=5)
+    axes.set_title(f"Multi-Trunk Steiner Tree ({len(np.unique(labels))} clusters)")
+    if viewport is not None:
+        axes.set_xlim(viewport[0], viewport[2])
+        axes.set_ylim(viewport[1], viewport[3])
+    else:
+        axes.autoscale_view()
+    axes.set_xlabel('X coordinate')
+    axes.set_ylabel('Y coordinate')
+    axes.grid(True, linestyle='--', alpha=0.7)
+    # A fixed legend corner; the default 'best' placement scans every plotted point
+    axes.legend(loc='upper right')
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output)
+        print(f"Saved plot to {output}")
+
+def main(n=DEFAULT_SINKS, plot_dir=None, seed=SINK_SEED):
+    # With plot_dir set, the plot is written there instead of shown
+    print("Problem 3: Clustered Multi-Trunk Steiner Tree")
+    points = generate_sinks(n, seed)
+    labels = cluster_sinks(points)
+    start = time.perf_counter()
+    tree, trunks, spine = build_multi_trunk_tree(points, labels)
+    delays = tree.sink_delays()
+    elapsed = time.perf_counter() - start
+    single, trunk = single_trunk_tree(points)
+    single_delays = single.sink_delays()
+    print(f"Sinks: {n} (seed {seed}), clusters: {len(trunks)}")
+    print(f"Spine Coordinates: {{{spine[0]}, {spine[1]}, {spine[2]}, {spine[3]}}}")
+    print(f"Multi-trunk wirelength: {tree.wirelength():.6g}, max delay {delays.max():.2e} s, "
+          f"skew {np.ptp(delays):.2e} s ({elapsed:.3f} s)")
+    print(f"Single-trunk wirelength: {single.wirelength():.6g}, max delay {single_delays.max():.2e} s, "
+          f"skew {np.ptp(single_delays):.2e} s")
+    if n <= PLOT_SINK_LIMIT:
+        plot_multi_trunk_tree(points, labels, tree, output=plot_output(plot_dir, "multi_trunk_steiner_tree.png"))
+    else:
+        print(f"Skipping the plot of {n} sinks (limit {PLOT_SINK_LIMIT}); use plot_multi_trunk_tree with a viewport")
+    return tree, labels, trunks
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SINKS, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,261 @@
+import sys
+import numpy as np
+from optimal_steiner_tree import (R_PER_UNIT, C_PER_UNIT, SINK_CAP, SteinerTree, read_input_data, find_critical_net,
+                                  measure_performance, count)
+from clustered_steiner import generate_sinks, single_trunk_tree
+
+# Target number of points per occupied cell of the nearest-neighbour grid
+NN_CELL_OCCUPANCY = 2
+
+# Times the nearest-neighbour grid is refined for crowded (clustered) inputs
+NN_REFINE_STEPS = 8
+
+# Candidate pairs evaluated per block by the nearest-neighbour search (bounds peak memory)
+NN_BLOCK_PAIRS = 1 << 22
+
+# Sink counts compared by main when no sizes are given
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# DME works in coordinates rotated by 45 degrees, u = x + y and v = x - y, where Manhattan distance becomes
+# Chebyshev distance and every merging segment (a Manhattan arc) is an axis-parallel box [ulo, uhi] x [vlo, vhi]
+def to_rotated(x, y):
+    return x + y, x - y
+
+def from_rotated(u, v):
+    return (u + v) / 2, (u - v) / 2
+
+def box_distance(lo_a, hi_a, lo_b, hi_b):
+    # Chebyshev gap between boxes given as (k, 2) lower and upper corners: Manhattan distance of the arcs
+    gap = np.maximum(np.maximum(lo_a - hi_b, lo_b - hi_a), 0)
+    return gap.max(axis=1)
+
+def _cell_keys(points, origin, cell):
+    cells = np.floor((points - origin) / cell).astype(np.int64)
+    return cells, cells[:, 0] * (cells[:, 1].max() + 3) + cells[:, 1]
+
+def _grid_search(points, queries, origin, cell):
+    # Nearest other point of each query among the 3 x 3 grid cells around it, or -1 if those are empty
+    cells, keys = _cell_keys(points, origin, cell)
+    width = cells[:, 1].max() + 3
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    around = (cells[queries, 0, None] + offsets[:, 0]) * width + cells[queries, 1, None] + offsets[:, 1]
+    start = np.searchsorted(sorted_keys, around, side='left').ravel()
+    sizes = np.searchsorted(sorted_keys, around, side='right').ravel() - start
+    per_query = sizes.reshape(-1, 9).sum(axis=1)
+    found = np.full(len(queries), -1, dtype=np.int64)
+    best = np.full(len(queries), np.inf)
+    # Blocks of whole queries, each evaluating at most about NN_BLOCK_PAIRS candidates
+    bounds = np.searchsorted(np.cumsum(per_query), np.arange(1, int(per_query.sum()) // NN_BLOCK_PAIRS + 1) * NN_BLOCK_PAIRS)
+    for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(queries)]))):
+        if hi <= lo:
+            continue
+        block_sizes = sizes[9 * lo:9 * hi]
+        counts = per_query[lo:hi]
+        owner = np.repeat(np.arange(lo, hi), counts)
+        slot = np.arange(len(owner)) - np.repeat(np.cumsum(block_sizes) - block_sizes, block_sizes)
+        candidate = order[np.repeat(start[9 * lo:9 * hi], block_sizes) + slot]
+        query = queries[owner]
+        distance = np.maximum(np.abs(points[candidate, 0] - points[query, 0]), np.abs(points[candidate, 1] - points[query, 1]))
+        distance[candidate == query] = np.inf
+        # Candidates come grouped by query: segment minima, then the first candidate reaching each minimum
+        searched = np.flatnonzero(counts)
+        segment_start = (np.cumsum(counts) - counts)[searched]
+        nearest = np.minimum.reduceat(distance, segment_start) if len(searched) else np.empty(0)
+        at_minimum = np.flatnonzero(distance == np.repeat(nearest, counts[searched]))
+        _, first = np.unique(owner[at_minimum], return_index=True)
+        hit = at_minimum[first]
+        hit = hit[np.isfinite(distance[hit])]
+        found[owner[hit]] = candidate[hit]
+        best[owner[hit]] = distance[hit]
+    return found, best
+
+def nearest_neighbours(points):
+    # Exact Chebyshev nearest neighbour of every point with a uniform grid. A neighbour within one cell
+    # size of the query is exact (anything outside the 3 x 3 block is farther), so queries left unresolved
+    # are retried on a grid with twice the cell size. Each pass is a sort, so the search is O(m log m).
+    m = len(points)
+    nn = np.full(m, -1, dtype=np.int64)
+    dist = np.full(m, np.inf)
+    if m < 2:
+        return nn, dist
+    origin = points.min(axis=0)
+    span = float((points.max(axis=0) - origin).max())
+    if span == 0:
+        return (np.arange(m) + 1) % m, np.zeros(m)
+    cell = span / np.sqrt(m / NN_CELL_OCCUPANCY)
+    # Smaller cells when crowded cells would dominate the candidate count
+    for _ in range(NN_REFINE_STEPS):
+        _, occupancy = np.unique(_cell_keys(points, origin, cell)[1], return_counts=True)
+        if (occupancy.astype(float) ** 2).sum() <= 4 * NN_CELL_OCCUPANCY * m:
+            break
+        cell /= 2
+    pending = np.arange(m)
+    while len(pending):
+        found, best = _grid_search(points, pending, origin, cell)
+        resolved = (best <= cell) | (cell >= span)
+        nn[pending[resolved]] = found[resolved]
+        dist[pending[resolved]] = best[resolved]
+        pending = pending[~resolved]
+        cell *= 2
+    return nn, dist
+
+def greedy_pairs(nn, dist, points):
+    # Disjoint pairs from the nearest-neighbour graph, shortest edges first. Where that pairs fewer than a
+    # quarter of the points (several points sharing one nearest neighbour), the leftover points are also
+    # paired with their successor in sorted (u, v) order, shortest pairs first, so every call returns at
+    # least len(points) // 4 pairs
+    matched = [False] * len(nn)
+    first, second = [], []
+    order = np.argsort(dist, kind='stable')
+    for i, j in zip(order.tolist(), nn[order].tolist()):
+        if j >= 0 and not matched[i] and not matched[j]:
+            matched[i] = matched[j] = True
+            first.append(i)
+            second.append(j)
+    needed = len(nn) // 4 - len(first)
+    if needed > 0:
+        rest = np.flatnonzero(~np.array(matched))
+        rest = rest[np.lexsort((points[rest, 1], points[rest, 0]))]
+        a, b = rest[0:len(rest) - 1:2], rest[1::2]
+        take = np.argsort(np.abs(points[a] - points[b]).max(axis=1), kind='stable')[:needed]
+        first.extend(a[take].tolist())
+        second.extend(b[take].tolist())
+        count("dme_fallback_pairs", len(take))
+    return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+
+def _detour_length(delay_gap, load, r_per_unit, c_per_unit):
+    # Wire length L with r L (c L + load) = delay_gap, i.e. the wire that delays the faster side enough
+    root = np.sqrt(load ** 2 + 4 * c_per_unit * np.maximum(delay_gap, 0) / r_per_unit)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(delay_gap > 0, 2 * delay_gap / r_per_unit / (load + root), 0.0)
+
+def zero_skew_merge(distance, delay_a, cap_a, delay_b, cap_b, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
+    # Wire lengths (len_a, len_b) from the merge point to subtrees a and b that equalize their Elmore delays.
+    # Each wire is lumped as in calculate_elmore_delay, delaying its subtree by r e (c e + C). Balancing the
+    # two sides over a connection of the given distance puts the tap at
+    #     e_a = (r d (c d + C_b) + t_b - t_a) / (r (C_a + C_b + 2 c d)),
+    # and when that falls outside [0, d] the tap sits on the slower subtree and the other wire is lengthened
+    # (snaked) beyond d until the delays match.
+    numerator = r_per_unit * distance * (c_per_unit * distance + cap_b) + delay_b - delay_a
+    denominator = r_per_unit * (cap_a + cap_b + 2 * c_per_unit * distance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        len_a = np.where(denominator > 0, numerator / denominator, distance / 2)
+    len_b = distance - len_a
+    slow_a, slow_b = len_a < 0, len_b < 0
+    len_b = np.where(slow_a, _detour_length(delay_a - delay_b, cap_b, r_per_unit, c_per_unit), len_b)
+    len_a = np.where(slow_a, 0.0, len_a)
+    len_a = np.where(slow_b, _detour_length(delay_b - delay_a, cap_a, r_per_unit, c_per_unit), len_a)
+    len_b = np.where(slow_b, 0.0, len_b)
+    return len_a, len_b
+
+@measure_performance
+def build_dme_tree(points, clock_pos=None, sink_cap=SINK_CAP, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
+    # Zero-skew clock tree by Deferred-Merge Embedding. Bottom-up, rounds of nearest-neighbour pairing merge
+    # subtrees two at a time; each merge fixes the wire lengths that balance the Elmore delays and keeps the
+    # whole locus of valid tap points (the merging segment). Top-down, the root is placed on its segment
+    # nearest the clock (default: the segment's centre) and every child at the point of its segment nearest
+    # its parent. Each round pairs at least a quarter of the subtrees (see greedy_pairs), so there are
+    # O(log n) rounds and the build is O(n log n).
+    # Returns a SteinerTree whose edges are single lumped wires, with every sink at the same delay.
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(points)
+    if n == 0:
+        raise ValueError("No sinks to build a clock tree for")
+    total = 2 * n - 1
+    lo, hi = np.empty((total, 2)), np.empty((total, 2))
+    lo[:n, 0], lo[:n, 1] = to_rotated(points[:, 0], points[:, 1])
+    hi[:n] = lo[:n]
+    delay, cap = np.zeros(total), np.zeros(total)
+    cap[:n] = sink_cap
+    children = np.full((total, 2), -1, dtype=np.int64)
+    wire = np.zeros((total, 2))
+    rounds = []
+    active = np.arange(n)
+    next_node = n
+    while len(active) > 1:
+        centres = (lo[active] + hi[active]) / 2
+        nn, dist = nearest_neighbours(centres)
+        first, second = greedy_pairs(nn, dist, centres)
+        count("dme_merge_rounds")
+        a, b = active[first], active[second]
+        distance = box_distance(lo[a], hi[a], lo[b], hi[b])
+        len_a, len_b = zero_skew_merge(distance, delay[a], cap[a], delay[b], cap[b], r_per_unit, c_per_unit)
+        count("dme_snaked_wires", int(np.count_nonzero(len_a + len_b > distance * (1 + 1e-12) + 1e-12)))
+        # The merging segment: points within reach_a of a's segment and reach_b of b's, reach_a + reach_b = d
+        reach_a = np.minimum(len_a, distance)[:, None]
+        reach_b = distance[:, None] - reach_a
+        seg_lo = np.maximum(lo[a] - reach_a, lo[b] - reach_b)
+        seg_hi = np.minimum(hi[a] + reach_a, hi[b] + reach_b)
+        # Rounding can leave the touching boxes a hair apart; collapse those sides to their midpoint
+        middle = (seg_lo + seg_hi) / 2
+        empty = seg_lo > seg_hi
+        seg_lo, seg_hi = np.where(empty, middle, seg_lo), np.where(empty, middle, seg_hi)
+        merged = next_node + np.arange(len(a))
+        next_node += len(a)
+        lo[merged], hi[merged] = seg_lo, seg_hi
+        delay[merged] = delay[a] + r_per_unit * len_a * (c_per_unit * len_a + cap[a])
+        cap[merged] = cap[a] + cap[b] + c_per_unit * (len_a + len_b)
+        children[merged] = np.column_stack((a, b))
+        wire[merged] = np.column_stack((len_a, len_b))
+        rounds.append(merged)
+        unmatched = np.ones(len(active), dtype=bool)
+        unmatched[first] = unmatched[second] = False
+        active = np.concatenate((active[unmatched], merged))
+    # Top-down embedding, one round at a time from the root
+    root = int(active[0])
+    position = np.empty((total, 2))
+    if clock_pos is None:
+        position[root] = (lo[root] + hi[root]) / 2
+    else:
+        position[root] = np.clip(to_rotated(float(clock_pos[0]), float(clock_pos[1])), lo[root], hi[root])
+    parent = np.full(total, -1, dtype=np.int64)
+    edge_length = np.zeros(total)
+    for merged in reversed(rounds):
+        for side in (0, 1):
+            child = children[merged, side]
+            position[child] = np.clip(position[merged], lo[child], hi[child])
+            parent[child] = merged
+            edge_length[child] = wire[merged, side]
+    x, y = from_rotated(position[:, 0], position[:, 1])
+    node_cap = np.zeros(total)
+    node_cap[:n] = sink_cap
+    return SteinerTree.from_parents(x, y, parent, np.arange(n), node_cap, edge_length)
+
+def compare_with_trunk(points):
+    # Wirelength, delay and skew of the DME tree against the single-trunk heuristic on the same sinks
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    trunk_tree, trunk = single_trunk_tree(points)
+    tree = build_dme_tree.__wrapped__(points)
+    trunk_delays, delays = trunk_tree.sink_delays(), tree.sink_delays()
+    _, critical_delay, critical_sink = find_critical_net(points, trunk, None, None, tree=tree)
+    return {
+        "sinks": len(points),
+        "trunk_wirelength": trunk_tree.wirelength(),
+        "dme_wirelength": tree.wirelength(),
+        "trunk_max_delay": float(trunk_delays.max()),
+        "dme_max_delay": float(delays.max()),
+        "trunk_skew": float(np.ptp(trunk_delays)),
+        "dme_skew": float(np.ptp(delays)),
+        "critical_sink": critical_sink,
+        "critical_delay": critical_delay,
+    }
+
+def main(argv):
+    # Arguments are node files in the assignment format or sink counts to generate; prints one comparison each
+    for source in argv[1:] or [str(n) for n in DEFAULT_SIZES]:
+        if source.isdigit():
+            points = generate_sinks(int(source))
+        else:
+            points = read_input_data(source)[1:].reshape(-1, 2)
+        stats = compare_with_trunk(points)
+        print(f"\n{source}: {stats['sinks']} sinks")
+        print(f"  Wirelength: trunk {stats['trunk_wirelength']:.6g}, DME {stats['dme_wirelength']:.6g}")
+        print(f"  Max delay:  trunk {stats['trunk_max_delay']:.2e} s, DME {stats['dme_max_delay']:.2e} s")
+        print(f"  Skew:       trunk {stats['trunk_skew']:.2e} s, DME {stats['dme_skew']:.2e} s")
+        if stats["critical_sink"] is not None:
+            print(f"  Critical sink: {stats['critical_sink'] + 1} ({stats['critical_delay']:.2e} s)")
+
+if __name__ == "__main__":
+    main(sys.argv)
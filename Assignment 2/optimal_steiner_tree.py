@@ -1,23 +1,58 @@
 import numpy as np
-import time
-import psutil
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import sys
-
-def measure_memory_usage():
-    # Returns memory usage in MB
-    process = psutil.Process()
-    memory_info = process.memory_info()
-    return memory_info.rss / (1024 * 1024)
-
-def read_input_data(filename):
-    # Reads node coordinates from file
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.binary_cache import load_cached_array, store_cached_array
+from common.instrumentation import measure_performance, count
+
+# Characters read from the file per chunk by the streaming parser
+READ_CHUNK_SIZE = 1 << 20
+
+SEPARATORS = str.maketrans('{},', '   ')
+
+def iter_input_batches(filename, chunk_size=READ_CHUNK_SIZE):
+    # Streams the numbers of the input file in fixed-size chunks as float64 batches
+    carry = ''
+    with open(filename, 'r') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            buffer = carry + chunk.translate(SEPARATORS)
+            if chunk and not buffer[-1:].isspace():
+                # The last token may continue in the next chunk
+                split_at = max(buffer.rfind(' '), buffer.rfind('\n'), buffer.rfind('\t'), buffer.rfind('\r'))
+                buffer, carry = buffer[:split_at + 1], buffer[split_at + 1:]
+            else:
+                carry = ''
+            tokens = buffer.split()
+            if tokens:
+                yield np.array(tokens, dtype=np.float64)
+            if not chunk:
+                break
+
+def read_input_data(filename, chunk_size=READ_CHUNK_SIZE, use_cache=True):
+    # Reads node coordinates from file into a growable float64 array, or memory-maps the binary cache
     try:
-        with open(filename, 'r') as file:
-            content = file.read().strip()
-            content = content.replace('{', '').replace('}', '').replace(',', ' ')
-            data = list(map(float, content.split()))
-            return data
+        if use_cache:
+            cached = load_cached_array(filename, "nodes")
+            if cached is not None:
+                return cached
+        data = np.empty(1024, dtype=np.float64)
+        values_read = 0
+        for batch in iter_input_batches(filename, chunk_size):
+            if values_read + len(batch) > len(data):
+                grown = np.empty(max(2 * len(data), values_read + len(batch)), dtype=np.float64)
+                grown[:values_read] = data[:values_read]
+                data = grown
+            data[values_read:values_read + len(batch)] = batch
+            values_read += len(batch)
+        data = data[:values_read].copy()
+        if use_cache:
+            store_cached_array(filename, "nodes", data)
+        return data
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
         sys.exit(1)
@@ -25,11 +60,10 @@ def read_input_data(filename):
         print(f"Error reading input file: {e}")
         sys.exit(1)
 
+@measure_performance
 def find_optimal_trunk(nodes):
     # Finds the optimal trunk line and Steiner points
-    start_time = time.time()
-    initial_memory = measure_memory_usage()
-    
+    nodes = np.asarray(nodes, dtype=float).tolist()
     n = int(nodes[0])
     node_coords = [(nodes[i], nodes[i+1]) for i in range(1, len(nodes), 2)]
     
@@ -47,15 +81,13 @@ def find_optimal_trunk(nodes):
         steiner_points.append((node_x, y_median))
     steiner_points = list(set(steiner_points))
 
-    end_time = time.time()
-    final_memory = measure_memory_usage()
-
-    print(f"Memory Usage: {final_memory - initial_memory:.2f} MB")
-    print(f"Time Taken: {end_time - start_time:.6f} seconds")
-
     return trunk, node_coords, steiner_points
 
-def calculate_elmore_delay(path_lengths, r_per_unit=1, c_per_unit=1e-15):
+# Wire resistance (Ohm) and capacitance (F) per unit length on M1
+R_PER_UNIT = 1
+C_PER_UNIT = 1e-15
+
+def calculate_elmore_delay(path_lengths, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
     # Computes total Elmore delay along a path
     total_delay = 0
     cumulative_capacitance = 0
@@ -84,73 +116,162 @@ def build_steiner_tree(node_coords, trunk, steiner_points):
         }
     return segments
 
-def find_critical_net(node_coords, trunk, segments, clock_pos):
-    # Finds the critical net with maximum delay
-    x1, y1, x2, y2 = trunk
-    clock_x, clock_y = clock_pos
-    max_delay = 0
-    critical_path = []
-    critical_node_idx = None
-
-    for i, (x, y) in enumerate(node_coords):
-        path_segments = []
-        path_lengths = []
-        total_delay = 0
-
-        if clock_y != y1:
-            connect_length = abs(clock_y - y1)
-            path_lengths.append(connect_length)
-
-        trunk_length = abs(x - clock_x)
-        if trunk_length > 0:
-            horizontal_segment = ((clock_x, y1), (x, y1))
-            path_segments.append(horizontal_segment)
-            path_lengths.append(trunk_length)
-            trunk_delay = calculate_elmore_delay(path_lengths)
-            total_delay += trunk_delay
-
-        vertical_length = abs(y - y1)
-        if vertical_length > 0:
-            vertical_segment = ((x, y1), (x, y))
-            path_segments.append(vertical_segment)
-            path_lengths.append(vertical_length)
-            vertical_delay = calculate_elmore_delay(path_lengths)
-            total_delay += vertical_delay
-
-        if total_delay > max_delay:
-            max_delay = total_delay
-            critical_path = path_segments
-            critical_node_idx = i
-
-    return critical_path, max_delay, critical_node_idx
+# Load capacitance (F) at each sink; the assignment models wire capacitance only
+SINK_CAP = 0.0
+
+class SteinerTree:
+    # Rooted routing tree stored as arrays in DFS preorder: node 0 is the root (parent -1), edge_length[i]
+    # is the wire from parent[i] to node i, node_cap[i] the load at node i, and the subtree of node i is
+    # the contiguous range i .. subtree_end[i] - 1. sink_nodes[k] is the node of the k-th input sink.
+    def __init__(self, x, y, parent, edge_length, node_cap, subtree_end, sink_nodes):
+        self.x = x
+        self.y = y
+        self.parent = parent
+        self.edge_length = edge_length
+        self.node_cap = node_cap
+        self.subtree_end = subtree_end
+        self.sink_nodes = sink_nodes
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def from_parents(cls, x, y, parent, sink_nodes, node_cap=None, edge_length=None):
+        # Reorders a tree given by parent indices (root marked -1) into DFS preorder; edge lengths
+        # default to the rectilinear distance between each node and its parent
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        parent = np.asarray(parent, dtype=np.int64)
+        n = len(parent)
+        node_cap = np.zeros(n) if node_cap is None else np.asarray(node_cap, dtype=float)
+        if edge_length is None:
+            safe_parent = np.where(parent >= 0, parent, np.arange(n))
+            edge_length = np.abs(x - x[safe_parent]) + np.abs(y - y[safe_parent])
+        roots = np.flatnonzero(parent < 0)
+        if len(roots) != 1:
+            raise ValueError(f"Expected one root, found {len(roots)}")
+        # Children in CSR form, then an explicit-stack DFS to number the nodes
+        children = np.argsort(parent, kind='stable')[1:]
+        child_start = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent[parent >= 0], minlength=n), out=child_start[1:])
+        children, child_start = children.tolist(), child_start.tolist()
+        order = []
+        stack = [int(roots[0])]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(reversed(children[child_start[node]:child_start[node + 1]]))
+        if len(order) != n:
+            raise ValueError("Parent array does not describe a connected tree")
+        order = np.array(order, dtype=np.int64)
+        position = np.empty(n, dtype=np.int64)
+        position[order] = np.arange(n)
+        new_parent = np.where(parent[order] >= 0, position[np.maximum(parent[order], 0)], -1)
+        # Subtree sizes accumulate bottom-up, i.e. over the preorder in reverse
+        size = [1] * n
+        parents = new_parent.tolist()
+        for node in range(n - 1, 0, -1):
+            size[parents[node]] += size[node]
+        return cls(x[order], y[order], new_parent, np.asarray(edge_length, dtype=float)[order], node_cap[order],
+                   np.arange(n) + np.array(size, dtype=np.int64), position[np.asarray(sink_nodes, dtype=np.int64)])
+
+    def elmore_delays(self, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
+        # Elmore delay from the root to every node in two linear passes. Each edge is lumped as in
+        # calculate_elmore_delay: its resistance drives its own capacitance plus everything downstream.
+        n = len(self.parent)
+        capacitance = self.node_cap + c_per_unit * self.edge_length
+        # Pass 1: downstream capacitance, a range sum over each preorder subtree
+        prefix = np.zeros(n + 1)
+        np.cumsum(capacitance, out=prefix[1:])
+        downstream = prefix[self.subtree_end] - prefix[:n]
+        # Pass 2: every edge delays its whole subtree; add it over that range and accumulate top-down
+        edge_delay = r_per_unit * self.edge_length * downstream
+        steps = np.bincount(self.subtree_end, weights=-edge_delay, minlength=n + 1)
+        steps[:n] += edge_delay
+        return np.cumsum(steps)[:n]
+
+    def sink_delays(self, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
+        return self.elmore_delays(r_per_unit, c_per_unit)[self.sink_nodes]
+
+    def path_segments(self, node):
+        # Root-to-node path as straight wire segments, merging collinear edges
+        points = []
+        while node >= 0:
+            point = (float(self.x[node]), float(self.y[node]))
+            if not points or point != points[-1]:
+                points.append(point)
+            node = self.parent[node]
+        points.reverse()
+        corners = [points[0]]
+        for k in range(1, len(points) - 1):
+            before, here, after = corners[-1], points[k], points[k + 1]
+            if not ((before[0] == here[0] == after[0]) or (before[1] == here[1] == after[1])):
+                corners.append(here)
+        if len(points) > 1:
+            corners.append(points[-1])
+        return list(zip(corners[:-1], corners[1:]))
+
+    def wirelength(self):
+        return float(self.edge_length.sum())
+
+def build_trunk_tree(node_coords, trunk, clock_x, sink_cap=SINK_CAP):
+    # Single-trunk tree rooted at the clock tap (clock_x clamped onto the trunk; the generator's own
+    # connection is delay-free). A chain of Steiner points runs each way along the trunk, one per
+    # distinct sink x, and every sink hangs from the Steiner point at its x.
+    x1, trunk_y, x2, _ = trunk
+    coords = np.asarray(node_coords, dtype=float).reshape(-1, 2)
+    n = len(coords)
+    lo, hi = min(x1, x2), max(x1, x2)
+    tap = min(max(clock_x, lo), hi)
+    points = np.unique(np.concatenate((coords[:, 0], [lo, hi])))
+    m = len(points)
+    split = int(np.searchsorted(points, tap, side='left'))
+    sink_point = np.searchsorted(points, coords[:, 0])
+    sinks_at = np.bincount(sink_point, minlength=m)
+    # Preorder: root, then the left chain walking away from the tap, then the right chain
+    chain = np.concatenate((np.arange(split - 1, -1, -1), np.arange(split, m)))
+    block_start = 1 + np.cumsum(1 + sinks_at[chain]) - (1 + sinks_at[chain])
+    point_node = np.empty(m, dtype=np.int64)
+    point_node[chain] = block_start
+    by_point = np.argsort(sink_point, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_point] = np.arange(n) - (np.cumsum(sinks_at) - sinks_at)[sink_point[by_point]]
+    sink_nodes = point_node[sink_point] + 1 + rank
+    total = 1 + m + n
+    x, y = np.empty(total), np.empty(total)
+    x[0], y[0] = tap, trunk_y
+    x[point_node], y[point_node] = points, trunk_y
+    x[sink_nodes], y[sink_nodes] = coords[:, 0], coords[:, 1]
+    parent = np.empty(total, dtype=np.int64)
+    parent[0] = -1
+    index = np.arange(m)
+    parent[point_node] = np.where(index >= split, point_node[np.maximum(index - 1, 0)],
+                                  point_node[np.minimum(index + 1, m - 1)])
+    parent[point_node[[p for p in (split - 1, split) if 0 <= p < m]]] = 0
+    parent[sink_nodes] = point_node[sink_point]
+    node_cap = np.zeros(total)
+    node_cap[sink_nodes] = sink_cap
+    left_end = 1 + split + int(sinks_at[:split].sum())
+    subtree_end = np.arange(1, total + 1)
+    subtree_end[0] = total
+    subtree_end[point_node] = np.where(index < split, left_end, total)
+    edge_length = np.abs(x - x[np.maximum(parent, 0)]) + np.abs(y - y[np.maximum(parent, 0)])
+    edge_length[0] = 0.0
+    return SteinerTree(x, y, parent, edge_length, node_cap, subtree_end, sink_nodes)
+
+def find_critical_net(node_coords, trunk, segments, clock_pos, tree=None):
+    # Finds the critical net with maximum delay; a prebuilt tree (e.g. from another engine) replaces the trunk tree
+    if tree is None:
+        tree = build_trunk_tree(node_coords, trunk, clock_pos[0])
+    delays = tree.sink_delays()
+    if len(delays) == 0 or delays.max() <= 0:
+        return [], 0, None
+    critical_node_idx = int(np.argmax(delays))
+    critical_path = tree.path_segments(tree.sink_nodes[critical_node_idx])
+    return critical_path, float(delays[critical_node_idx]), critical_node_idx
 
 def calculate_delays_to_all_nodes(node_coords, trunk, clock_pos):
     # Calculates delay to all nodes from clock
-    x1, y1, x2, y2 = trunk
-    clock_x, clock_y = clock_pos
-    node_delays = []
-
-    for node_pos in node_coords:
-        node_x, node_y = node_pos
-        path_lengths = []
-        total_delay = 0
-
-        if clock_y != y1 or clock_x not in [x1, x2]:
-            pass
-
-        trunk_length = abs(node_x - clock_x)
-        if trunk_length > 0:
-            path_lengths.append(trunk_length)
-            total_delay += calculate_elmore_delay(path_lengths)
-
-        vertical_length = abs(node_y - y1)
-        if vertical_length > 0:
-            path_lengths.append(vertical_length)
-            total_delay += calculate_elmore_delay(path_lengths)
-
-        node_delays.append(total_delay)
-
-    return node_delays
+    return build_trunk_tree(node_coords, trunk, clock_pos[0]).sink_delays().tolist()
 
 def calculate_initial_clock_skew(node_coords, trunk):
     # Calculates skew for initial clock position
@@ -168,10 +289,120 @@ def calculate_initial_clock_skew(node_coords, trunk):
 
     return initial_skew, delays
 
+def trunk_skew_profile(node_coords, trunk, sink_cap=SINK_CAP, r_per_unit=R_PER_UNIT, c_per_unit=C_PER_UNIT):
+    # Prefix sums that give the trunk tree's sink delays for any tap x without rebuilding it. Between two
+    # adjacent Steiner points P[j] <= x <= P[j+1], only the first edge on each side depends on x, so every
+    # sink delay is that edge's delay plus a constant read from the prefix extremes below.
+    x1, trunk_y, x2, _ = trunk
+    coords = np.asarray(node_coords, dtype=float).reshape(-1, 2)
+    points = np.unique(np.concatenate((coords[:, 0], [min(x1, x2), max(x1, x2)])))
+    m = len(points)
+    sink_point = np.searchsorted(points, coords[:, 0])
+    stub = np.abs(coords[:, 1] - trunk_y)
+    stub_cap = c_per_unit * stub + sink_cap
+    stub_delay = r_per_unit * stub * stub_cap
+    cap_at = np.bincount(sink_point, weights=stub_cap, minlength=m)
+    gaps = np.diff(points)
+    # Capacitance hanging beyond each point when the tree is driven from its left (right) side
+    right_cap = np.cumsum(cap_at[::-1])[::-1] + c_per_unit * (points[-1] - points)
+    left_cap = np.cumsum(cap_at) + c_per_unit * (points - points[0])
+    # Delay accumulated walking right (left) along the trunk from the first (last) point
+    right_delay = np.concatenate(([0.0], np.cumsum(r_per_unit * gaps * (c_per_unit * gaps + right_cap[1:]))))
+    left_delay = np.concatenate((np.cumsum((r_per_unit * gaps * (c_per_unit * gaps + left_cap[:-1]))[::-1])[::-1], [0.0]))
+    # Latest and earliest sink delay per point relative to those walks, then their suffix (prefix) extremes
+    late = np.full(m, -np.inf)
+    early = np.full(m, np.inf)
+    np.maximum.at(late, sink_point, stub_delay)
+    np.minimum.at(early, sink_point, stub_delay)
+    return {
+        "points": points,
+        "trunk_y": trunk_y,
+        "r_per_unit": r_per_unit,
+        "c_per_unit": c_per_unit,
+        "right_cap": right_cap,
+        "left_cap": left_cap,
+        "right_delay": right_delay,
+        "left_delay": left_delay,
+        "right_late": np.maximum.accumulate((right_delay + late)[::-1])[::-1],
+        "right_early": np.minimum.accumulate((right_delay + early)[::-1])[::-1],
+        "left_late": np.maximum.accumulate(left_delay + late),
+        "left_early": np.minimum.accumulate(left_delay + early),
+    }
+
+def _interval_skew(profile, j, t):
+    # Skew with the tap t past P[j] (0 <= t <= P[j+1] - P[j]); returns skew and the two crossing offsets
+    r, c = profile["r_per_unit"], profile["c_per_unit"]
+    gap = profile["points"][j + 1] - profile["points"][j]
+    right_first = r * (gap - t) * (c * (gap - t) + profile["right_cap"][j + 1])
+    left_first = r * t * (c * t + profile["left_cap"][j])
+    right_late = profile["right_late"][j + 1] - profile["right_delay"][j + 1]
+    right_early = profile["right_early"][j + 1] - profile["right_delay"][j + 1]
+    left_late = profile["left_late"][j] - profile["left_delay"][j]
+    left_early = profile["left_early"][j] - profile["left_delay"][j]
+    with np.errstate(invalid='ignore'):
+        skew = (np.maximum(right_first + right_late, left_first + left_late) -
+                np.minimum(right_first + right_early, left_first + left_early))
+    # right_first - left_first is linear in t (the squared terms cancel), so the latest and the
+    # earliest sink each switch sides at most once, where the two sides' delays cross
+    slope = 2 * r * c * gap + r * profile["right_cap"][j + 1] + r * profile["left_cap"][j]
+    at_zero = r * gap * (c * gap + profile["right_cap"][j + 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        late_cross = (at_zero + right_late - left_late) / slope
+        early_cross = (at_zero + right_early - left_early) / slope
+    return skew, late_cross, early_cross
+
+def skew_at_positions(clock_xs, profile):
+    # Clock skew of the trunk tree for each candidate clock x (taps clamp onto the trunk)
+    points = profile["points"]
+    clock_xs = np.clip(np.asarray(clock_xs, dtype=float), points[0], points[-1])
+    count("clock_positions_tested", len(clock_xs))
+    if len(points) == 1:
+        return np.full(len(clock_xs), profile["left_late"][0] - profile["left_early"][0])
+    j = np.clip(np.searchsorted(points, clock_xs, side='right') - 1, 0, len(points) - 2)
+    return _interval_skew(profile, j, clock_xs - points[j])[0]
+
+def optimize_clock_x(profile):
+    # Exact skew-minimizing tap: within each trunk interval the skew is piecewise linear in the tap
+    # position, with breakpoints only at the ends and the two crossings, so those are the only candidates
+    points = profile["points"]
+    if len(points) == 1:
+        return float(points[0]), float(profile["left_late"][0] - profile["left_early"][0])
+    j = np.arange(len(points) - 1)
+    gap = np.diff(points)
+    _, late_cross, early_cross = _interval_skew(profile, j, np.zeros(len(j)))
+    offsets = np.stack((np.zeros(len(j)), gap, late_cross, early_cross))
+    offsets = np.clip(np.nan_to_num(offsets, nan=0.0, posinf=0.0, neginf=0.0), 0.0, gap)
+    skews = _interval_skew(profile, np.broadcast_to(j, offsets.shape), offsets)[0]
+    count("clock_positions_tested", skews.size)
+    best = np.unravel_index(np.argmin(skews), skews.shape)
+    return float(points[best[1]] + offsets[best]), float(skews[best])
+
+@measure_performance
 def minimize_clock_skew(node_coords, trunk, segments):
-    # Finds clock location minimizing skew
-    start_time = time.time()
-    initial_memory = measure_memory_usage()
+    # Finds clock location minimizing skew; delays do not depend on the clock y, so the
+    # generator is placed level with the trunk and only its x is optimized
+    x1, y1, x2, y2 = trunk
+    best_x, best_skew = optimize_clock_x(trunk_skew_profile(node_coords, trunk))
+    best_position = (best_x, y1)
+    tree = build_trunk_tree(node_coords, trunk, best_x)
+    best_delays = tree.sink_delays().tolist()
+    best_critical_path, _, best_critical_node_idx = find_critical_net(node_coords, trunk, segments, best_position, tree)
+
+    if best_delays:
+        print("\nOptimal Clock Position Analysis:")
+        print(f"Clock Position: {{{best_position[0]}, {best_position[1]}}}")
+        print("Delays to each node:")
+        for i, delay in enumerate(best_delays):
+            print(f"  Node {i+1}: {delay:.2e} seconds")
+        print(f"  Min Delay: {min(best_delays):.2e} seconds")
+        print(f"  Max Delay: {max(best_delays):.2e} seconds")
+        print(f"Minimum Clock Skew: {best_skew:.2e} seconds")
+
+    return best_position, best_skew, best_critical_path, best_critical_node_idx, best_delays
+
+@measure_performance
+def minimize_clock_skew_grid(node_coords, trunk, segments):
+    # Finds clock location minimizing skew on a fixed 21x21 grid (reference for minimize_clock_skew)
     x1, y1, x2, y2 = trunk
 
     best_skew = float('inf')
@@ -192,6 +423,7 @@ def minimize_clock_skew(node_coords, trunk, segments):
         for y in np.arange(y_min, y_max + y_step, y_step):
             clock_pos = (x, y)
             node_delays = calculate_delays_to_all_nodes(node_coords, trunk, clock_pos)
+            count("clock_positions_tested")
 
             if node_delays:
                 current_skew = max(node_delays) - min(node_delays)
@@ -204,12 +436,6 @@ def minimize_clock_skew(node_coords, trunk, segments):
                     best_critical_path = critical_path
                     best_critical_node_idx = critical_node_idx
 
-    end_time = time.time()
-    final_memory = measure_memory_usage()
-
-    print(f"Memory Usage: {final_memory - initial_memory:.2f} MB")
-    print(f"Time Taken: {end_time - start_time:.6f} seconds")
-
     if best_delays:
         print("\nOptimal Clock Position Analysis:")
         print(f"Clock Position: {{{best_position[0]}, {best_position[1]}}}")
@@ -227,7 +453,80 @@ def nearest_point_on_trunk(x, y, x1, x2, y_trunk):
     trunk_x = max(x1, min(x2, x))
     return (trunk_x, y_trunk)
 
-def main_problem1(nodes):
+# Above this many segments, length/delay labels are skipped and SVG output is rasterized
+LABEL_DENSITY_LIMIT = 200
+
+def plot_steiner_tree(node_coords, trunk, segments, steiner_points, critical_path=None, critical_node_idx=None,
+                      clock_generator=None, node_delays=None, output=None, viewport=None, label_limit=LABEL_DENSITY_LIMIT):
+    # Plots the Steiner tree with collections; writes to output (PNG/SVG) without a window when given
+    if output is None:
+        figure = plt.figure(figsize=(12, 10))
+    else:
+        figure = Figure(figsize=(12, 10))
+    axes = figure.add_subplot()
+    lines = np.array([[start, end] for start, end in segments], dtype=float).reshape(-1, 2, 2)
+    info = list(segments.values())
+    nodes = np.asarray(node_coords, dtype=float).reshape(-1, 2)
+    steiner = np.asarray(steiner_points, dtype=float).reshape(-1, 2)
+    if viewport is not None:
+        x_min, y_min, x_max, y_max = viewport
+        keep = ((lines[:, :, 0].min(axis=1) <= x_max) & (lines[:, :, 0].max(axis=1) >= x_min) &
+                (lines[:, :, 1].min(axis=1) <= y_max) & (lines[:, :, 1].max(axis=1) >= y_min))
+        lines = lines[keep]
+        info = [segment for segment, kept in zip(info, keep) if kept]
+        def inside(points):
+            return points[(points[:, 0] >= x_min) & (points[:, 0] <= x_max) & (points[:, 1] >= y_min) & (points[:, 1] <= y_max)]
+        steiner = inside(steiner)
+    dense = len(lines) > label_limit
+    axes.add_collection(LineCollection(lines, colors='tab:blue', linewidths=0.5 if dense else 2, rasterized=dense))
+    if critical_path:
+        axes.add_collection(LineCollection(np.array(critical_path, dtype=float), colors='tab:red',
+                                           linewidths=1.5 if dense else 3, label='Critical path'))
+    if not dense:
+        for (start, end), segment in zip(lines, info):
+            mid_x, mid_y = (start + end) / 2
+            axes.text(mid_x, mid_y, f"L={segment['length']:g}\nD={segment['delay']:.1e}", fontsize=7,
+                      horizontalalignment='center', verticalalignment='bottom', color='tab:blue')
+    shown = nodes if viewport is None else inside(nodes)
+    marker_size = 4 if dense else 40
+    axes.scatter(shown[:, 0], shown[:, 1], s=marker_size, color='tab:green', label='Nodes', zorder=3, rasterized=dense)
+    axes.scatter(steiner[:, 0], steiner[:, 1], s=marker_size, color='tab:orange', marker='s', label='Steiner points',
+                 zorder=3, rasterized=dense)
+    if not dense and node_delays is not None:
+        for (x, y), delay in zip(node_coords, node_delays):
+            axes.annotate(f"{delay:.1e}", (x, y), textcoords='offset points', xytext=(4, 4), fontsize=7, color='tab:green')
+    if critical_node_idx is not None:
+        x, y = node_coords[critical_node_idx]
+        axes.scatter([x], [y], s=marker_size * 3, facecolors='none', edgecolors='tab:red', label='Critical node', zorder=4)
+    if clock_generator is not None:
+        tap = nearest_point_on_trunk(clock_generator[0], clock_generator[1], trunk[0], trunk[2], trunk[1])
+        axes.plot([clock_generator[0], tap[0]], [clock_generator[1], tap[1]], linestyle='--', color='tab:purple')
+        axes.scatter([clock_generator[0]], [clock_generator[1]], s=150, marker='*', color='tab:purple',
+                     label='Clock generator', zorder=5)
+    axes.set_title("Steiner Tree" if clock_generator is None else "Steiner Tree with Optimized Clock Generator")
+    if viewport is not None:
+        axes.set_xlim(viewport[0], viewport[2])
+        axes.set_ylim(viewport[1], viewport[3])
+    else:
+        axes.autoscale_view()
+    axes.set_xlabel('X coordinate')
+    axes.set_ylabel('Y coordinate')
+    axes.grid(True, linestyle='--', alpha=0.7)
+    axes.legend()
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output)
+        print(f"Saved plot to {output}")
+
+def plot_output(plot_dir, name):
+    # Plot file inside plot_dir, or None to show the plot interactively
+    if plot_dir is None:
+        return None
+    os.makedirs(plot_dir, exist_ok=True)
+    return os.path.join(plot_dir, name)
+
+def main_problem1(nodes, plot_dir=None):
     print("Problem 1: Optimal Steiner Tree Trunk")
     trunk, node_coords, steiner_points = find_optimal_trunk(nodes)
     segments = build_steiner_tree(node_coords, trunk, steiner_points)
@@ -239,24 +538,26 @@ def main_problem1(nodes):
     print(f"Steiner Points: {steiner_points}")
     plot_steiner_tree(node_coords, trunk, segments, steiner_points, 
                       critical_path=critical_path, critical_node_idx=critical_node_idx,
-                      node_delays=initial_delays)
+                      node_delays=initial_delays, output=plot_output(plot_dir, "steiner_tree.png"))
     return trunk, node_coords, steiner_points, segments, initial_delays
 
-def main_problem2(nodes, trunk, node_coords, steiner_points, segments):
+def main_problem2(nodes, trunk, node_coords, steiner_points, segments, plot_dir=None):
     print("\nProblem 2: Minimize Clock Skew with New Clock Location")
     clock_generator, min_skew, critical_path, critical_node_idx, optimal_delays = minimize_clock_skew(node_coords, trunk, segments)
     print(f"Optimal Clock Generator Location: {{{clock_generator[0]}, {clock_generator[1]}}}")
     print(f"Minimum Clock Skew: {min_skew:.2e} seconds")
     plot_steiner_tree(node_coords, trunk, segments, steiner_points, 
                       critical_path=critical_path, critical_node_idx=critical_node_idx, 
-                      clock_generator=clock_generator, node_delays=optimal_delays)
+                      clock_generator=clock_generator, node_delays=optimal_delays,
+                      output=plot_output(plot_dir, "steiner_tree_clock.png"))
     return clock_generator
 
-def main():
+def main(plot_dir=None):
+    # With plot_dir set, plots are written there instead of shown
     filename = input("Enter the input file name: ")
     input_data = read_input_data(filename)
-    trunk, node_coords, steiner_points, segments, initial_delays = main_problem1(input_data)
-    clock_generator = main_problem2(input_data, trunk, node_coords, steiner_points, segments)
+    trunk, node_coords, steiner_points, segments, initial_delays = main_problem1(input_data, plot_dir)
+    clock_generator = main_problem2(input_data, trunk, node_coords, steiner_points, segments, plot_dir)
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,222 @@
+import sys
+import heapq
+import numpy as np
+from optimal_steiner_tree import SteinerTree, read_input_data, measure_performance
+from clustered_steiner import generate_sinks, single_trunk_tree
+
+# Upper bound on Steiner refinement passes; each pass is O(n log n) and the gains shrink quickly
+REFINE_PASSES = 8
+
+# Edges per node paired by the Steiner refinement: its shortest non-zero ones, which a rectilinear MST
+# over distinct points never exceeds, so co-located sinks cannot make a node's pair table quadratic
+PAIR_SLOTS = 8
+
+# Sink counts compared by main when no sizes are given
+DEFAULT_SIZES = (100, 1000, 10000)
+
+def octant_candidate_edges(points):
+    # Candidate edges containing a rectilinear MST: every point joined to its L1-nearest neighbour in four
+    # of its octants (the other four octants give the same edges seen from the other end). Each octant
+    # is one sweep in decreasing x with a Fenwick tree of minima over the ranks of y - x.
+    xs, ys = points[:, 0].copy(), points[:, 1].copy()
+    first, second = [], []
+    for direction in range(4):
+        if direction % 2 == 1:
+            xs, ys = ys, xs
+        elif direction == 2:
+            xs = -xs
+        keys = ys - xs
+        levels = np.unique(keys)
+        m = len(levels)
+        # Reversed 1-based ranks, so "key >= key_i" is a Fenwick prefix
+        slots = (m - np.searchsorted(levels, keys)).tolist()
+        sums = (xs + ys).tolist()
+        best_sum = [np.inf] * (m + 1)
+        best_point = [-1] * (m + 1)
+        for i in np.lexsort((ys, xs))[::-1].tolist():
+            k, found, nearest = slots[i], -1, np.inf
+            while k > 0:
+                if best_sum[k] < nearest:
+                    nearest, found = best_sum[k], best_point[k]
+                k -= k & -k
+            if found >= 0:
+                first.append(i)
+                second.append(found)
+            k, value = slots[i], sums[i]
+            while k <= m:
+                if value < best_sum[k]:
+                    best_sum[k], best_point[k] = value, i
+                k += k & -k
+    first, second = np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+    return first, second, np.abs(points[first] - points[second]).sum(axis=1)
+
+def _adjacency(n, first, second):
+    # Undirected edge list as CSR: neighbours of node u are columns[start[u]:start[u + 1]]
+    rows = np.concatenate((first, second))
+    columns = np.concatenate((second, first))
+    order = np.argsort(rows, kind='stable')
+    start = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=start[1:])
+    return start, columns[order], order % len(first)
+
+def prim_mst(n, first, second, weight, root=0):
+    # Prim's algorithm with a binary heap over a sparse graph; returns the MST as parent indices (root -1)
+    start, columns, edge = _adjacency(n, first, second)
+    start, columns, weights = start.tolist(), columns.tolist(), weight[edge].tolist()
+    parent = [-1] * n
+    best = [np.inf] * n
+    done = [False] * n
+    heap = [(0.0, root, -1)]
+    while heap:
+        _, node, via = heapq.heappop(heap)
+        if done[node]:
+            continue
+        done[node] = True
+        parent[node] = via
+        for k in range(start[node], start[node + 1]):
+            other = columns[k]
+            if not done[other] and weights[k] < best[other]:
+                best[other] = weights[k]
+                heapq.heappush(heap, (weights[k], other, node))
+    if not all(done):
+        raise ValueError("Candidate graph is disconnected")
+    return np.array(parent, dtype=np.int64)
+
+def _manhattan(a, b):
+    return np.abs(a - b).sum(axis=-1)
+
+def steinerize(nodes, edge_u, edge_v, passes=REFINE_PASSES):
+    # Edge-based refinement: two tree edges v-a and v-b sharing a node are rerouted through their median
+    # point s (the optimal Steiner point of {v, a, b}), sharing the wire v-s. Each pass scores every pair
+    # among the PAIR_SLOTS shortest edges at every node, then applies the best non-overlapping merges greedily.
+    nodes, edge_u, edge_v = nodes.copy(), edge_u.copy(), edge_v.copy()
+    for _ in range(passes):
+        ends = np.concatenate((edge_u, edge_v))
+        others = np.concatenate((edge_v, edge_u))
+        edge_of = np.tile(np.arange(len(edge_u)), 2)
+        # Zero-length edges (co-located nodes) save nothing; of the rest, keep each node's shortest few
+        length = _manhattan(nodes[ends], nodes[others])
+        order = np.lexsort((length, ends))
+        order = order[length[order] > 0]
+        ends, others, edge_of = ends[order], others[order], edge_of[order]
+        degree = np.bincount(ends, minlength=len(nodes))
+        rank = np.arange(len(ends)) - np.repeat(np.cumsum(degree) - degree, degree)
+        kept = rank < PAIR_SLOTS
+        ends, others, edge_of = ends[kept], others[kept], edge_of[kept]
+        degree = np.bincount(ends, minlength=len(nodes))
+        start = np.cumsum(degree) - degree
+        # All pairs of edges at each node, by slot within the node's incidence list; ordering the slot pairs
+        # by their larger slot makes a node of degree d use exactly the first d(d-1)/2 of them
+        table_b, table_a = np.tril_indices(int(degree.max(initial=0)), k=-1)
+        pairs = degree * (degree - 1) // 2
+        owner = np.repeat(np.arange(len(nodes)), pairs)
+        pair = np.arange(len(owner)) - np.repeat(np.cumsum(pairs) - pairs, pairs)
+        ka, kb = start[owner] + table_a[pair], start[owner] + table_b[pair]
+        v, a, b = nodes[owner], nodes[others[ka]], nodes[others[kb]]
+        s = np.median(np.stack((v, a, b)), axis=0)
+        saving = _manhattan(v, a) + _manhattan(v, b) - _manhattan(v, s) - _manhattan(s, a) - _manhattan(s, b)
+        candidates = np.flatnonzero(saving > 1e-9 * max(1.0, float(np.abs(nodes).max())))
+        if len(candidates) == 0:
+            break
+        candidates = candidates[np.argsort(-saving[candidates], kind='stable')]
+        used = np.zeros(len(edge_u), dtype=bool)
+        chosen = []
+        for c, e1, e2 in zip(candidates.tolist(), edge_of[ka[candidates]].tolist(), edge_of[kb[candidates]].tolist()):
+            if not used[e1] and not used[e2]:
+                used[e1] = used[e2] = True
+                chosen.append(c)
+        chosen = np.array(chosen, dtype=np.int64)
+        hub, left, right = owner[chosen], others[ka[chosen]], others[kb[chosen]]
+        e1, e2 = edge_of[ka[chosen]], edge_of[kb[chosen]]
+        point = s[chosen]
+        at_left = np.all(point == nodes[left], axis=1)
+        at_right = np.all(point == nodes[right], axis=1) & ~at_left
+        fresh = ~(at_left | at_right)
+        # The Steiner point is the left (right) end itself: hang the other edge from it instead of the hub
+        edge_u[e2[at_left]], edge_v[e2[at_left]] = left[at_left], right[at_left]
+        edge_u[e1[at_right]], edge_v[e1[at_right]] = right[at_right], left[at_right]
+        new = len(nodes) + np.arange(int(fresh.sum()))
+        nodes = np.concatenate((nodes, point[fresh]))
+        edge_u[e1[fresh]], edge_v[e1[fresh]] = new, left[fresh]
+        edge_u[e2[fresh]], edge_v[e2[fresh]] = new, right[fresh]
+        edge_u = np.concatenate((edge_u, hub[fresh]))
+        edge_v = np.concatenate((edge_v, new))
+    return nodes, edge_u, edge_v
+
+@measure_performance
+def build_rsmt(points, passes=REFINE_PASSES):
+    # Rectilinear Steiner tree: MST over the octant candidate graph, then Steiner refinement. Returns the
+    # node coordinates (the sinks first, then Steiner points) and the edge list.
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return points.copy(), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    first, second, weight = octant_candidate_edges(points)
+    parent = prim_mst(len(points), first, second, weight)
+    child = np.flatnonzero(parent >= 0)
+    return steinerize(points, parent[child], child, passes)
+
+def rsmt_tree(points, clock_pos=None, passes=REFINE_PASSES):
+    # The RSMT as a SteinerTree rooted at the tree node nearest the clock (default: the sinks' median point),
+    # the generator's connection being delay-free. Every L-shaped edge gets an explicit bend node so that
+    # each straight wire is lumped separately, as in calculate_elmore_delay.
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    nodes, edge_u, edge_v = build_rsmt(points, passes)
+    if clock_pos is None:
+        clock_pos = np.median(points, axis=0)
+    root = int(np.argmin(_manhattan(nodes, np.asarray(clock_pos, dtype=float))))
+    # Orient the edges away from the root with a breadth-first walk
+    start, columns, _ = _adjacency(len(nodes), edge_u, edge_v)
+    start, columns = start.tolist(), columns.tolist()
+    parent = [-1] * len(nodes)
+    seen = [False] * len(nodes)
+    seen[root] = True
+    queue = [root]
+    for node in queue:
+        for other in columns[start[node]:start[node + 1]]:
+            if not seen[other]:
+                seen[other] = True
+                parent[other] = node
+                queue.append(other)
+    parent = np.array(parent, dtype=np.int64)
+    bent = np.flatnonzero((parent >= 0) & (nodes[:, 0] != nodes[np.maximum(parent, 0), 0]) &
+                          (nodes[:, 1] != nodes[np.maximum(parent, 0), 1]))
+    bends = np.column_stack((nodes[bent, 0], nodes[parent[bent], 1]))
+    bend_ids = len(nodes) + np.arange(len(bent))
+    parent = np.concatenate((parent, parent[bent]))
+    parent[bent] = bend_ids
+    nodes = np.concatenate((nodes, bends))
+    return SteinerTree.from_parents(nodes[:, 0], nodes[:, 1], parent, np.arange(len(points)))
+
+def compare_with_trunk(points):
+    # Wirelength, delay and skew of the RSMT against the single-trunk heuristic on the same sinks
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    trunk_tree, _ = single_trunk_tree(points)
+    tree = rsmt_tree(points)
+    trunk_delays, delays = trunk_tree.sink_delays(), tree.sink_delays()
+    return {
+        "sinks": len(points),
+        "trunk_wirelength": trunk_tree.wirelength(),
+        "rsmt_wirelength": tree.wirelength(),
+        "wirelength_ratio": tree.wirelength() / trunk_tree.wirelength() if trunk_tree.wirelength() else 1.0,
+        "trunk_max_delay": float(trunk_delays.max()),
+        "rsmt_max_delay": float(delays.max()),
+        "trunk_skew": float(np.ptp(trunk_delays)),
+        "rsmt_skew": float(np.ptp(delays)),
+    }
+
+def main(argv):
+    # Arguments are node files in the assignment format or sink counts to generate; prints one comparison each
+    for source in argv[1:] or [str(n) for n in DEFAULT_SIZES]:
+        if source.isdigit():
+            points = generate_sinks(int(source))
+        else:
+            points = read_input_data(source)[1:].reshape(-1, 2)
+        stats = compare_with_trunk(points)
+        print(f"\n{source}: {stats['sinks']} sinks")
+        print(f"  Wirelength: trunk {stats['trunk_wirelength']:.6g}, RSMT {stats['rsmt_wirelength']:.6g} "
+              f"(ratio {stats['wirelength_ratio']:.3f})")
+        print(f"  Max delay:  trunk {stats['trunk_max_delay']:.2e} s, RSMT {stats['rsmt_max_delay']:.2e} s")
+        print(f"  Skew:       trunk {stats['trunk_skew']:.2e} s, RSMT {stats['rsmt_skew']:.2e} s")
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Sizes, distributions and per-case time limit used unless given on the command line
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+RECTANGLE_DISTRIBUTIONS = ("uniform", "clustered", "rows")
+SINK_DISTRIBUTIONS = ("uniform", "clustered")
+DEFAULT_TIMEOUT = 600
+DEFAULT_SEED = 2024
+
+# Stages above these sizes are skipped: their Python-level loops would dominate the whole run
+STAGE_SIZE_LIMITS = {
+    "find_optimal_trunk": 10 ** 6,
+    "build_rsmt": 10 ** 6,
+}
+
+# Prefix of the result lines a case process prints between the tools' own console output
+RESULT_MARKER = "BENCHMARK "
+
+def report(kind, **fields):
+    # Case processes only: they put ROOT on sys.path before running a suite
+    from common.instrumentation import measure_peak_memory_usage
+    print(RESULT_MARKER + json.dumps(dict(fields, kind=kind, peak_rss_mb=measure_peak_memory_usage())), flush=True)
+
+def timed(name, size, func, *args, **kwargs):
+    # Runs one stage and reports its time; stages over their size limit are reported as skipped
+    if size > STAGE_SIZE_LIMITS.get(name, float('inf')):
+        report("stage", name=name, skipped=True)
+        return None
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    report("stage", name=name, seconds=time.perf_counter() - start)
+    return result
+
+def run_rectangle_case(distribution, size, seed):
+    sys.path.insert(0, os.path.join(ROOT, 'Assignment 1'))
+    import classify_rectangles as cr
+    from layout_generators import generate_layout
+    rectangles = timed("generate_layout", size, generate_layout, size, distribution, seed)
+    centre = tuple(float(v) for v in (rectangles[:, [1, 3]].mean(), rectangles[:, [2, 4]].mean()))
+    results = {
+        "non_overlapping": timed("find_non_overlapping_rectangles", size, cr.find_non_overlapping_rectangles, rectangles),
+        "overlapping": timed("find_overlapping_rectangles", size, cr.find_overlapping_rectangles, rectangles),
+        "contained": timed("find_contained_rectangles", size, cr.find_contained_rectangles, rectangles),
+        "abutting": timed("find_abutting_rectangles", size, cr.find_abutting_rectangles, rectangles),
+        "enclosing": timed("find_enclosing_rectangles", size, cr.find_enclosing_rectangles.__wrapped__, rectangles, centre),
+    }
+    # The same classifiers in integer-coordinate mode
+    layout = timed("quantize_rectangles", size, cr.quantize_rectangles, rectangles)
+    results["overlapping_integer"] = timed("find_overlapping_rectangles_integer", size, cr.find_overlapping_rectangles, layout)
+    results["abutting_integer"] = timed("find_abutting_rectangles_integer", size, cr.find_abutting_rectangles, layout)
+    report("counts", counts={name: len(result) if isinstance(result, np.ndarray) else len(result[0])
+                             for name, result in results.items()})
+
+def run_sink_case(distribution, size, seed):
+    sys.path.insert(0, os.path.join(ROOT, 'Assignment 2'))
+    import optimal_steiner_tree as ost
+    from clustered_steiner import generate_sinks, cluster_sinks, build_multi_trunk_tree
+    from rsmt import build_rsmt
+    from dme_clock_tree import build_dme_tree
+    points = timed("generate_sinks", size, generate_sinks, size, seed, distribution=distribution)
+    nodes = np.concatenate(([size], points.ravel()))
+    timed("find_optimal_trunk", size, ost.find_optimal_trunk.__wrapped__, nodes)
+    y_median = float(np.median(points[:, 1]))
+    trunk = (float(points[:, 0].min()), y_median, float(points[:, 0].max()), y_median)
+    tree = timed("build_trunk_tree", size, ost.build_trunk_tree, points, trunk, trunk[0])
+    delays = timed("elmore_delays", size, tree.sink_delays)
+    clock_x, skew = timed("optimize_clock_x", size, lambda: ost.optimize_clock_x(ost.trunk_skew_profile(points, trunk)))
+    labels = timed("cluster_sinks", size, cluster_sinks.__wrapped__, points)
+    multi = timed("build_multi_trunk_tree", size, build_multi_trunk_tree.__wrapped__, points, labels, 1)
+    rsmt = timed("build_rsmt", size, build_rsmt.__wrapped__, points)
+    dme = timed("build_dme_tree", size, build_dme_tree.__wrapped__, points)
+    dme_delays = timed("dme_elmore_delays", size, dme.sink_delays)
+    quality = {
+        "trunk_wirelength": tree.wirelength(),
+        "initial_skew": float(np.ptp(delays)),
+        "optimal_skew": skew,
+        "multi_trunk_wirelength": multi[0].wirelength(),
+        "multi_trunk_skew": float(np.ptp(multi[0].sink_delays())),
+        "dme_wirelength": dme.wirelength(),
+        "dme_skew": float(np.ptp(dme_delays)),
+    }
+    if rsmt is not None:
+        nodes, edge_u, edge_v = rsmt
+        quality["rsmt_wirelength"] = float(np.abs(nodes[edge_u] - nodes[edge_v]).sum())
+        quality["rsmt_trunk_wirelength_ratio"] = (quality["rsmt_wirelength"] / quality["trunk_wirelength"]
+                                                  if quality["trunk_wirelength"] else 1.0)
+    report("counts", counts=quality)
+
+SUITES = {"rectangles": run_rectangle_case, "sinks": run_sink_case}
+
+def run_case(case, timeout):
+    # Runs one case in a fresh interpreter, so its peak RSS is its own; stages finished before a
+    # timeout or crash are kept
+    entry = dict(case, status="ok", stages={}, counts={}, peak_rss_mb=None)
+    command = [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout, cwd=ROOT)
+        output = process.stdout
+        if process.returncode != 0:
+            entry["status"] = "error"
+            entry["error"] = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit {process.returncode}"
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or "")
+        entry["status"] = "timeout"
+    entry["wall_seconds"] = time.perf_counter() - start
+    for line in output.splitlines():
+        if not line.startswith(RESULT_MARKER):
+            continue
+        record = json.loads(line[len(RESULT_MARKER):])
+        entry["peak_rss_mb"] = record["peak_rss_mb"]
+        if record["kind"] == "stage":
+            entry["stages"][record["name"]] = None if record.get("skipped") else record["seconds"]
+        else:
+            entry["counts"] = record["counts"]
+    return entry
+
+def environment():
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+# Stage-by-stage time ratios against an earlier result file, for the cases and stages both contain
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    def key(entry):
+        return entry["suite"], entry["distribution"], entry["size"], entry["seed"]
+    previous = {key(entry): entry for entry in baseline["results"]}
+    print(f"\nComparison with {baseline_path} (old / new, above 1 is faster):")
+    for entry in results:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        for stage, seconds in entry["stages"].items():
+            before = old["stages"].get(stage)
+            if seconds and before:
+                print(f"  {entry['suite']:<10} {entry['distribution']:<9} {entry['size']:>9} {stage:<32} "
+                      f"{before:9.4f}s -> {seconds:9.4f}s  x{before / seconds:.2f}")
+
+def parse_sizes(text):
+    return [int(float(size)) for size in text.split(',') if size]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time the layout classifiers and the Steiner/skew pipeline on "
+                                                 "seeded synthetic inputs.")
+    parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="comma-separated input sizes, e.g. 1e2,1e3,1e4 (up to 1e7)")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated: rectangles,sinks")
+    parser.add_argument("--rectangle-distributions", default=",".join(RECTANGLE_DISTRIBUTIONS))
+    parser.add_argument("--sink-distributions", default=",".join(SINK_DISTRIBUTIONS))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds allowed per case")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier result file to compare stage times against")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+    if args.case:
+        sys.path.insert(0, ROOT)
+        case = json.loads(args.case)
+        SUITES[case["suite"]](case["distribution"], case["size"], case["seed"])
+        return
+    distributions = {"rectangles": args.rectangle_distributions.split(','), "sinks": args.sink_distributions.split(',')}
+    results = []
+    for suite in args.suites.split(','):
+        for distribution in distributions[suite]:
+            for size in args.sizes:
+                case = {"suite": suite, "distribution": distribution, "size": size, "seed": args.seed}
+                entry = run_case(case, args.timeout)
+                results.append(entry)
+                timings = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in entry["stages"].items()
+                                    if seconds is not None)
+                print(f"{suite} {distribution} n={size}: {entry['status']}, peak RSS {entry['peak_rss_mb'] or 0:.0f} MB; "
+                      f"{timings}", flush=True)
+    with open(args.output, 'w') as file:
+        json.dump({"environment": environment(), "results": results}, file, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main(sys.argv)
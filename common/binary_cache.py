@@ -0,0 +1,52 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Bump when the cached array layout changes so stale sidecars are ignored
+CACHE_FORMAT_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 20
+
+# Sidecar paths for a source file: <source>.<kind>.npy holds the array, <source>.<kind>.json its key
+def cache_paths(source, kind):
+    return f"{source}.{kind}.npy", f"{source}.{kind}.json"
+
+# Identity of a source file: size, modification time and content hash
+def source_key(source):
+    stat = os.stat(source)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(source, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return {
+        "version": CACHE_FORMAT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+
+# Memory-map the cached array for a source file, or return None if it is missing or stale
+def load_cached_array(source, kind):
+    array_path, key_path = cache_paths(source, kind)
+    try:
+        with open(key_path, 'r') as file:
+            stored_key = json.load(file)
+        if stored_key != source_key(source):
+            return None
+        return np.load(array_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+# Write the parsed array and its key next to the source file; failures leave no cache behind
+def store_cached_array(source, kind, array):
+    array_path, key_path = cache_paths(source, kind)
+    try:
+        key = source_key(source)
+        np.save(array_path + ".tmp.npy", np.ascontiguousarray(array))
+        os.replace(array_path + ".tmp.npy", array_path)
+        with open(key_path + ".tmp", 'w') as file:
+            json.dump(key, file)
+        os.replace(key_path + ".tmp", key_path)
+        return True
+    except OSError:
+        return False
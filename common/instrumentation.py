@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import atexit
+import platform
+import functools
+import tracemalloc
+from contextlib import contextmanager
+import psutil
+
+_process = psutil.Process()
+
+# Measure current memory usage (RSS) in MB
+def measure_memory_usage():
+    return _process.memory_info().rss / 1024 / 1024
+
+# Peak memory usage (max RSS) of this process so far in MB; ru_maxrss is bytes on macOS, kilobytes elsewhere
+def measure_peak_memory_usage():
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set instead
+        return getattr(_process.memory_info(), "peak_wset", _process.memory_info().rss) / 1024 / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+# Timers, nested memory tracing and counters for one run, exported as a JSON report
+class Profiler:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.sections = {}
+        self.counters = {}
+        self.started_at = time.time()
+        self._memory_frames = []
+        self._owns_trace = False
+
+    def _enter_memory(self):
+        if not self.trace_memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_trace = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._memory_frames:
+            # Fold the enclosing section's peak so far into it before this section resets the peak
+            parent = self._memory_frames[-1]
+            parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"start": current, "peak": current}
+        self._memory_frames.append(frame)
+        return frame
+
+    def _exit_memory(self, frame):
+        if frame is None:
+            return None
+        peak = max(tracemalloc.get_traced_memory()[1], frame["peak"])
+        self._memory_frames.pop()
+        if self._memory_frames:
+            parent = self._memory_frames[-1]
+            parent["peak"] = max(parent["peak"], peak)
+        elif self._owns_trace:
+            tracemalloc.stop()
+            self._owns_trace = False
+        return peak - frame["start"]
+
+    # Time a block with perf_counter_ns; returns its stats dict, filled in when the block exits
+    @contextmanager
+    def section(self, name):
+        stats = {}
+        frame = self._enter_memory()
+        start_rss = measure_memory_usage()
+        start = time.perf_counter_ns()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            stats["elapsed_ns"] = elapsed
+            stats["rss_delta_mb"] = measure_memory_usage() - start_rss
+            stats["peak_bytes"] = self._exit_memory(frame)
+            entry = self.sections.setdefault(name, {"calls": 0, "total_ns": 0, "max_ns": 0, "peak_bytes": None})
+            entry["calls"] += 1
+            entry["total_ns"] += elapsed
+            entry["max_ns"] = max(entry["max_ns"], elapsed)
+            if stats["peak_bytes"] is not None:
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, stats["peak_bytes"])
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def report(self):
+        return {
+            "started_at": self.started_at,
+            "argv": sys.argv,
+            "python": platform.python_version(),
+            "trace_memory": self.trace_memory,
+            "peak_rss_mb": measure_peak_memory_usage(),
+            "sections": self.sections,
+            "counters": self.counters,
+        }
+
+    def write_report(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+# Process-wide profiler: PROFILE_MEMORY=1 turns on tracemalloc, PROFILE_REPORT=<path> writes the JSON report at exit
+PROFILER = Profiler(trace_memory=os.environ.get("PROFILE_MEMORY") == "1")
+if os.environ.get("PROFILE_REPORT"):
+    atexit.register(PROFILER.write_report, os.environ["PROFILE_REPORT"])
+
+def count(name, amount=1):
+    PROFILER.count(name, amount)
+
+# Worker-process initializer: forked workers inherit the parent's tracemalloc session, which slows them down
+def stop_inherited_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+# Decorator to measure execution time and memory usage of functions
+# With items_arg set, the length of that positional argument is reported as throughput
+def measure_performance(func=None, *, items_arg=None):
+    if func is None:
+        return lambda f: measure_performance(f, items_arg=items_arg)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PROFILER.section(func.__qualname__) as stats:
+            result = func(*args, **kwargs)
+        execution_time = stats["elapsed_ns"] / 1e9
+        print(f"\nPerformance metrics for {func.__name__}:")
+        print(f"Execution time: {execution_time:.4f} seconds")
+        print(f"Memory usage: {stats['rss_delta_mb']:.2f} MB")
+        if stats["peak_bytes"] is not None:
+            print(f"Peak memory: {stats['peak_bytes'] / 1024 / 1024:.2f} MB")
+        if items_arg is not None:
+            items = len(args[items_arg])
+            PROFILER.count(f"{func.__qualname__}.items", items)
+            print(f"Throughput: {items / max(execution_time, 1e-9):.0f} items/second ({items} items)")
+        return result
+    return wrapper
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The assignment folders are script directories rather than packages; put them on the path like running the scripts does
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in (ROOT, os.path.join(ROOT, 'Assignment 1'), os.path.join(ROOT, 'Assignment 2')):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
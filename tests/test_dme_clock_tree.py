@@ -0,0 +1,32 @@
+import math
+import numpy as np
+from common.instrumentation import PROFILER
+from dme_clock_tree import build_dme_tree, greedy_pairs, nearest_neighbours
+
+# Build a tree and return the number of bottom-up merge rounds it took
+def merge_rounds(points):
+    PROFILER.counters.clear()
+    tree = build_dme_tree.__wrapped__(points)
+    delays = tree.sink_delays()
+    assert np.ptp(delays) <= 1e-9 * delays.max()
+    return PROFILER.counters["dme_merge_rounds"]
+
+# Every round pairs at least a quarter of the subtrees, leaving at most 3/4 of them
+def round_bound(n):
+    return math.ceil(math.log(n) / math.log(4 / 3)) + 1
+
+def test_collinear_geometric_sinks_merge_in_logarithmic_rounds():
+    for ratio, n in ((1.1, 400), (1.5, 150), (2.0, 60)):
+        points = np.column_stack((ratio ** np.arange(n), np.zeros(n)))
+        assert merge_rounds(points) <= round_bound(n)
+
+def test_star_neighbourhoods_still_pair_a_quarter():
+    # Hubs with four spokes each: every spoke's nearest neighbour is its hub, so nearest-neighbour
+    # matching alone pairs only one point in five
+    spokes = np.array([(0, 0), (10, 0), (-10, 0), (0, 10), (0, -10)], dtype=float)
+    points = (spokes[None, :, :] + 1000 * np.arange(200)[:, None, None] * np.array([1.0, 0.0])).reshape(-1, 2)
+    nn, dist = nearest_neighbours(points)
+    first, second = greedy_pairs(nn, dist, points)
+    assert len(first) >= len(points) // 4
+    assert len(np.unique(np.concatenate((first, second)))) == 2 * len(first)
+    assert merge_rounds(points) <= round_bound(len(points))
@@ -0,0 +1,34 @@
+import numpy as np
+from classify_rectangles import quantize_rectangles
+from layout_generators import generate_layout
+from spatial_index import LARGE_SHAPE_CELLS, RectangleGridIndex
+
+# Many small shapes plus one covering the whole die
+def die_layout(n):
+    small = generate_layout(n, "uniform")
+    lo, hi = small[:, 1:].min(), small[:, 1:].max()
+    return np.vstack([small, [[n + 1, lo, lo, hi, hi]]]), small
+
+def test_die_sized_shape_keeps_cell_entries_linear():
+    rectangles, small = die_layout(20000)
+    for layout, plain in ((rectangles, small), (quantize_rectangles(rectangles), quantize_rectangles(small))):
+        index, without_die = RectangleGridIndex(layout), RectangleGridIndex(plain)
+        assert index.large_rows.tolist() == [len(small)]
+        assert len(index.cell_members) <= len(without_die.cell_members) + LARGE_SHAPE_CELLS
+        assert len(index.cell_members) <= 4 * len(rectangles)
+
+def test_queries_include_large_shapes():
+    rectangles, small = die_layout(2000)
+    index = RectangleGridIndex(rectangles)
+    die_id = int(rectangles[-1, 0])
+    points = rectangles[:100, 1:3]
+    offsets, rows = index.point_rows(points)
+    ids = index.ids[rows]
+    for k, (x, y) in enumerate(points):
+        inside = (rectangles[:, 1] <= x) & (x <= rectangles[:, 3]) & (rectangles[:, 2] <= y) & (y <= rectangles[:, 4])
+        assert ids[offsets[k]:offsets[k + 1]].tolist() == rectangles[inside, 0].astype(int).tolist()
+        assert die_id in index.query_point((x, y)).tolist()
+    offsets, rows = index.window_rows(small[:100, 1:] + 0.25)
+    ids = index.ids[rows]
+    for k in range(100):
+        assert die_id in ids[offsets[k]:offsets[k + 1]].tolist()